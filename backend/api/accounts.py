@@ -0,0 +1,15 @@
+# Email lookups for account collections through their case-insensitive unique email index
+from pymongo.collation import Collation, CollationStrength
+
+# Must match the collation of the email indexes in indexes.py, or lookups cannot use them.
+# Those indexes (created at deploy by 'manage.py ensure_indexes') are what reject duplicate signups.
+EMAIL_COLLATION = Collation(locale='en', strength=CollationStrength.SECONDARY)
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def find_by_email(collection, email, projection=None):
+    """One indexed, case-insensitive lookup; `email` is matched literally, never as a pattern"""
+    return collection.find_one({'email': normalize_email(email)}, projection, collation=EMAIL_COLLATION)
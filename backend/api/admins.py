@@ -1,10 +1,8 @@
 import json
 import jwt
-import hashlib
 import os
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
@@ -14,28 +12,22 @@ from rest_framework import status
 import re
 from dotenv import load_dotenv
 
+from .accounts import find_by_email, normalize_email
+from .images import InvalidImage, image_url, store_data_url
+from .mongo import get_events_collection, get_admins_collection
+from .passwords import PasswordHashingBusy, hash_password, hashing_busy_response, upgrade_password_hash, verify_password
+
 load_dotenv()
 
 # Constants
 MIN_PASSWORD_LENGTH = 8
 PASSWORD_REGEX = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+={}\[\]:;<>,.?~\\/-]).{8,}$"
-MONGODB_URI = os.getenv('MONGODB_URI')
-MONGODB_DATABASE = os.getenv('MONGODB_DATABASE')
 JWT_EXPIRATION_DELTA = timedelta(days=7)
 SECRET_KEY = os.getenv('SECRET_KEY')
-PASSWORD_SALT = os.getenv('PASSWORD_SALT', 'default-salt-value')
 
-# Helper for events collection
-def get_events_collection():
-    try:
-        client = MongoClient(MONGODB_URI)
-        db = client[MONGODB_DATABASE]
-        return client, db.events
-    except PyMongoError as e:
-        raise Exception(f"Database connection error: {str(e)}")
 # ...existing code...
 
-# Event creation endpoint (base64 image support)
+# Event creation endpoint (base64 image upload, stored in GridFS)
 @csrf_exempt
 @api_view(['POST'])
 def create_event(request):
@@ -55,9 +47,14 @@ def create_event(request):
         if not eventTitle or not eventVenue or not startTime or not endTime or not startDate or not endDate or not eventDescription or eventImage is None:
             return Response({'error': 'All fields are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            image_fields = store_data_url(eventImage)
+        except InvalidImage as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         # Insert event
         try:
-            client, events = get_events_collection()
+            events = get_events_collection()
             event_doc = {
                 'title': eventTitle,
                 'venue': eventVenue,
@@ -67,7 +64,7 @@ def create_event(request):
                 'end_date': endDate,
                 'cost': eventCost,
                 'description': eventDescription,
-                'image': eventImage,  # base64 string
+                **image_fields,
                 'type': 'PAID' if float(eventCost) > 0 else 'FREE',
                 'created_at': datetime.utcnow(),
             }
@@ -76,13 +73,10 @@ def create_event(request):
             return Response({'message': 'Event created successfully', 'event': event_doc}, status=status.HTTP_201_CREATED)
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
     except Exception as e:
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-# Event list endpoint (returns base64 image)
+# Event list endpoint (returns image URLs)
 @csrf_exempt
 @api_view(['GET'])
 def list_events(request):
@@ -91,7 +85,7 @@ def list_events(request):
         limit = int(request.GET.get('limit', 9))
         skip = (page - 1) * limit
         try:
-            client, events = get_events_collection()
+            events = get_events_collection()
             total = events.count_documents({})
             cursor = events.find({}).sort('created_at', -1).skip(skip).limit(limit)
             event_list = []
@@ -106,7 +100,7 @@ def list_events(request):
                     'end_date': event.get('end_date', ''),
                     'cost': event.get('cost', 0),
                     'description': event.get('description', ''),
-                    'image': event.get('image', None),  # base64 string
+                    'image': image_url(request, event),
                     'type': event.get('type', 'FREE'),
                     'date': event.get('start_date', ''),
                     'location': event.get('venue', ''),
@@ -115,26 +109,9 @@ def list_events(request):
             return Response({'events': event_list, 'pagination': {'has_more': has_more, 'total': total}}, status=status.HTTP_200_OK)
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
     except Exception as e:
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-def get_admins_collection():
-    try:
-        client = MongoClient(MONGODB_URI)
-        db = client[MONGODB_DATABASE]
-        return client, db.admins
-    except PyMongoError as e:
-        raise Exception(f"Database connection error: {str(e)}")
-
-def hash_password(password):
-    return hashlib.sha256((password + PASSWORD_SALT).encode()).hexdigest()
-
-def verify_password(password, hashed_password):
-    return hash_password(password) == hashed_password
-
 def generate_jwt_token(admin_data):
     payload = {
         'admin_id': str(admin_data['_id']),
@@ -159,7 +136,7 @@ def validate_password(password):
 def admin_signup(request):
     try:
         data = json.loads(request.body)
-        email = data.get('email', '').strip()
+        email = normalize_email(data.get('email', ''))
         password = data.get('password', '')
         confirm_password = data.get('confirmPassword', '')
         name = data.get('name', '').strip()
@@ -179,11 +156,10 @@ def admin_signup(request):
             return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            client, admins = get_admins_collection()
-            existing = admins.find_one({'email': email})
-            if existing:
+            admins = get_admins_collection()
+            # Cheap indexed check first so a taken address never costs a password hash
+            if find_by_email(admins, email, {'_id': 1}):
                 return Response({'error': 'Admin with this email already exists'}, status=status.HTTP_409_CONFLICT)
-
             admin_data = {
                 'email': email,
                 'name': name if name else email.split('@')[0],
@@ -192,7 +168,11 @@ def admin_signup(request):
                 'updated_at': datetime.utcnow(),
             }
 
-            result = admins.insert_one(admin_data)
+            # The unique email index still rejects a concurrent signup for the same address
+            try:
+                result = admins.insert_one(admin_data)
+            except DuplicateKeyError:
+                return Response({'error': 'Admin with this email already exists'}, status=status.HTTP_409_CONFLICT)
             admin_data['_id'] = result.inserted_id
 
             token = generate_jwt_token(admin_data)
@@ -207,11 +187,10 @@ def admin_signup(request):
                 'message': 'Admin registered successfully'
             }, status=status.HTTP_201_CREATED)
 
+        except PasswordHashingBusy:
+            return hashing_busy_response()
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
 
     except json.JSONDecodeError:
         return Response({'error': 'Invalid JSON data'}, status=status.HTTP_400_BAD_REQUEST)
@@ -224,18 +203,19 @@ def admin_signup(request):
 def admin_login(request):
     try:
         data = json.loads(request.body)
-        email = data.get('email', '').strip()
+        email = normalize_email(data.get('email', ''))
         password = data.get('password', '')
 
         if not email or not password:
             return Response({'error': 'Email and password are required'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            client, admins = get_admins_collection()
-            admin = admins.find_one({'email': email})
+            admins = get_admins_collection()
+            admin = find_by_email(admins, email)
 
             if not admin or not verify_password(password, admin['password']):
                 return Response({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
+            upgrade_password_hash(admins, admin, password)
 
             token = generate_jwt_token(admin)
             return Response({
@@ -249,11 +229,10 @@ def admin_login(request):
                 'message': 'Login successful'
             }, status=status.HTTP_200_OK)
 
+        except PasswordHashingBusy:
+            return hashing_busy_response()
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
 
     except json.JSONDecodeError:
         return Response({'error': 'Invalid JSON data'}, status=status.HTTP_400_BAD_REQUEST)
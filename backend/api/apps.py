@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if settings.EVENT_EXPIRY_SWEEP_INTERVAL > 0:
+            from .expiry import start_expiry_sweeper
+            start_expiry_sweeper(settings.EVENT_EXPIRY_SWEEP_INTERVAL)
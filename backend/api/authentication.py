@@ -0,0 +1,119 @@
+# Bearer JWT authentication shared by all API views, with a cache of already-verified tokens
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import jwt
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication
+
+AUTH_REQUIRED = 'Authentication required'
+TOKEN_EXPIRED = 'Token expired'
+TOKEN_INVALID = 'Invalid token'
+
+
+class TokenUser:
+    """request.user for a valid token; `claims` is the decoded JWT payload"""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims):
+        self.claims = claims
+
+    @property
+    def user_type(self):
+        return self.claims.get('user_type')
+
+    def __str__(self):
+        return self.claims.get('email', '')
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of decoded claims keyed by token digest; entries drop out at the token's `exp`"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # digest -> (exp, claims)
+        self._lock = threading.Lock()
+
+    def get(self, digest, now):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= now:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[1]
+
+    def put(self, digest, claims):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (claims.get('exp'), claims)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_verified_tokens = VerifiedTokenCache(settings.JWT_VERIFIED_CACHE_SIZE)
+
+
+def decode_token(token):
+    """Claims of a valid token; raises jwt.InvalidTokenError (incl. ExpiredSignatureError)"""
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = _verified_tokens.get(digest, time.time())
+    if claims is None:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+        _verified_tokens.put(digest, claims)
+    return claims
+
+
+class JWTAuthentication(BaseAuthentication):
+    """Authenticate `Authorization: Bearer <jwt>` headers.
+
+    A missing or bad token leaves the request anonymous rather than failing it,
+    so public endpoints keep working; views that need a token read the reason
+    with auth_error().
+    """
+
+    def authenticate(self, request):
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            request.auth_error = AUTH_REQUIRED
+            return None
+        token = auth_header.split(' ')[1]
+        try:
+            claims = decode_token(token)
+        except jwt.ExpiredSignatureError:
+            request.auth_error = TOKEN_EXPIRED
+            return None
+        except jwt.InvalidTokenError:
+            request.auth_error = TOKEN_INVALID
+            return None
+        return TokenUser(claims), token
+
+    def authenticate_header(self, request):
+        return 'Bearer'
+
+
+def get_token_claims(request):
+    """Decoded claims of the request's bearer token, or None"""
+    user = request.user
+    return user.claims if isinstance(user, TokenUser) else None
+
+
+def auth_error(request):
+    return getattr(request, 'auth_error', AUTH_REQUIRED)
+
+
+def authenticate_request(request):
+    """get_token_claims() for plain Django views, which DRF does not authenticate"""
+    result = JWTAuthentication().authenticate(request)
+    return result[0].claims if result else None
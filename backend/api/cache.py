@@ -0,0 +1,87 @@
+# Bounded in-process LRU/TTL cache with version-based invalidation and stale-while-revalidate
+import threading
+import time
+from collections import OrderedDict
+
+HIT = 'HIT'
+MISS = 'MISS'
+STALE = 'STALE'
+
+
+class VersionedCache:
+    """LRU cache whose entries are tied to a data version.
+
+    An entry is fresh for `ttl` seconds. For a further `stale_ttl` seconds it is
+    still served while one background thread recomputes it. An entry computed
+    under an older version (see `version_func`) is never served.
+    """
+
+    def __init__(self, maxsize, ttl, stale_ttl, version_func):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.version_func = version_func
+        self._entries = OrderedDict()  # key -> (version, stored_at, value)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'evictions': 0}
+
+    def get_or_compute(self, key, compute):
+        """Return (value, outcome) where outcome is HIT, STALE or MISS"""
+        if self.maxsize <= 0:
+            return compute(), MISS
+        version = self.version_func()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                age = now - entry[1]
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[2], HIT
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stats['stale_hits'] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, compute), daemon=True).start()
+                    return entry[2], STALE
+            self._stats['misses'] += 1
+
+        value = compute()
+        self._store(key, version, value)
+        return value, MISS
+
+    def _refresh(self, key, compute):
+        try:
+            version = self.version_func()
+            value = compute()
+            self._store(key, version, value)
+            with self._lock:
+                self._stats['refreshes'] += 1
+        except Exception as e:
+            print(f"Cache refresh failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,42 @@
+# Process-local catalogue version and cached counts for the events collection.
+# A bump only reaches the bumping process; writes from other workers or management
+# commands show up once cache entries expire, i.e. within EVENT_COUNT_CACHE_TTL and
+# EVENT_LIST_CACHE_TTL + EVENT_LIST_CACHE_STALE_TTL.
+import threading
+import time
+from django.conf import settings
+
+_lock = threading.Lock()
+_version = 0
+_active_count = None  # (version, computed_at, count)
+
+
+def get_catalog_version():
+    return _version
+
+
+def bump_catalog_version():
+    """Invalidate everything this process derived from the event catalogue.
+
+    Called after any write that adds events or changes their status.
+    """
+    global _version
+    with _lock:
+        _version += 1
+        return _version
+
+
+def get_active_event_count(events, query):
+    """Number of listed events matching `query`, recounted only after a catalogue write or once the TTL lapses.
+
+    The TTL bounds staleness caused by writes from other processes.
+    """
+    global _active_count
+    cached = _active_count
+    now = time.monotonic()
+    if cached and cached[0] == _version and now - cached[1] < settings.EVENT_COUNT_CACHE_TTL:
+        return cached[2]
+    version = _version
+    count = events.count_documents(query)
+    _active_count = (version, now, count)
+    return count
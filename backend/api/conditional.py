@@ -0,0 +1,47 @@
+# Conditional GET (ETag / Last-Modified / 304) from cheap data-version validators
+import hashlib
+from datetime import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def latest_change(collection, query, field='updated_at'):
+    """Newest value of `field` among documents matching `query`, read from an index"""
+    document = collection.find_one(query, {field: 1, '_id': 0}, sort=[(field, -1)])
+    return document.get(field) if document else None
+
+
+def make_etag(*parts):
+    # Weak: equal validators mean equivalent JSON, not byte-identical bodies
+    return 'W/"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _strip_weak(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def is_not_modified(request, etag, last_modified=None):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        tags = [_strip_weak(tag) for tag in if_none_match.split(',')]
+        return '*' in tags or _strip_weak(etag) in tags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if if_modified_since is not None and last_modified is not None:
+        return int(last_modified.replace(tzinfo=timezone.utc).timestamp()) <= if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified=None, private=False):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.replace(tzinfo=timezone.utc).timestamp())
+    # Clients may store responses but must revalidate before reusing them
+    response['Cache-Control'] = f"{'private' if private else 'public'}, no-cache"
+    return response
+
+
+def not_modified_response(etag, last_modified=None, private=False):
+    return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified, private)
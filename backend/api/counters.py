@@ -0,0 +1,74 @@
+# Denormalized per-event registration counters (events.registration_stats)
+from datetime import datetime
+
+# Payment statuses counted as paid; revenue sums the event cost of paid registrations
+PAID_STATUSES = ('completed', 'paid')
+PENDING_STATUS = 'pending'
+EMPTY_STATS = {'total': 0, 'paid': 0, 'pending': 0, 'waitlisted': 0, 'revenue': 0}
+
+# Legacy events may hold the cost as a string; those add nothing to revenue
+_NUMERIC_COST = {'$cond': [{'$isNumber': '$cost'}, '$cost', 0]}
+
+
+def _add(path, amount):
+    return {'$add': [{'$ifNull': ['$' + path, 0]}, amount]}
+
+
+def registration_delta(payment_status, waitlisted=False):
+    """Counter changes for one registration, revenue excluded"""
+    if waitlisted:
+        return {'waitlisted': 1}
+    delta = {'total': 1}
+    if payment_status in PAID_STATUSES:
+        delta['paid'] = 1
+    elif payment_status == PENDING_STATUS:
+        delta['pending'] = 1
+    return delta
+
+
+def counter_update(payment_status, waitlisted=False, sign=1, seats=0):
+    """Update pipeline applying one registration (sign=-1 to undo it) to an event.
+
+    A pipeline rather than $inc so revenue can add the event's own cost in the
+    same atomic write; `seats` adjusts seats_taken alongside.
+    """
+    changes = {
+        f'registration_stats.{name}': _add(f'registration_stats.{name}', sign * count)
+        for name, count in registration_delta(payment_status, waitlisted).items()
+    }
+    if not waitlisted and payment_status in PAID_STATUSES:
+        changes['registration_stats.revenue'] = _add('registration_stats.revenue', {'$multiply': [sign, _NUMERIC_COST]})
+    if seats:
+        changes['seats_taken'] = _add('seats_taken', seats)
+    changes['stats_updated_at'] = datetime.utcnow()
+    return [{'$set': changes}]
+
+
+def bulk_counter_increments(counts, cost):
+    """$inc document for many confirmed registrations; `counts` maps stat name to count"""
+    increments = {f'registration_stats.{name}': count for name, count in counts.items() if count}
+    if counts.get('paid') and isinstance(cost, (int, float)):
+        increments['registration_stats.revenue'] = counts['paid'] * cost
+    return increments
+
+
+def stats_pipeline(match=None):
+    """Aggregation recomputing registration_stats from the registrations collection, one document per event_id"""
+    confirmed = {'$ne': [{'$ifNull': ['$status', 'confirmed']}, 'waitlisted']}
+    paid = {'$and': [confirmed, {'$in': ['$payment_status', list(PAID_STATUSES)]}]}
+    pending = {'$and': [confirmed, {'$eq': ['$payment_status', PENDING_STATUS]}]}
+    return [
+        {'$match': match or {}},
+        {'$group': {
+            '_id': '$event_id',
+            'total': {'$sum': {'$cond': [confirmed, 1, 0]}},
+            'paid': {'$sum': {'$cond': [paid, 1, 0]}},
+            'pending': {'$sum': {'$cond': [pending, 1, 0]}},
+            'waitlisted': {'$sum': {'$cond': [confirmed, 0, 1]}},
+            'revenue': {'$sum': {'$cond': [paid, {'$cond': [{'$isNumber': '$event_cost'}, '$event_cost', 0]}, 0]}},
+        }},
+    ]
+
+
+def render_stats(event):
+    return {**EMPTY_STATS, **(event.get('registration_stats') or {})}
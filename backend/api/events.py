@@ -1,9 +1,7 @@
 import json
-import jwt
 import hashlib
 import os
 from datetime import datetime, timedelta
-from pymongo import MongoClient
 from pymongo.errors import PyMongoError
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
@@ -14,40 +12,80 @@ from rest_framework import status
 from bson import ObjectId
 from dotenv import load_dotenv
 
+from .authentication import get_token_claims
+from .cache import VersionedCache
+from .catalog import bump_catalog_version, get_active_event_count, get_catalog_version
+from .counters import render_stats
+from .conditional import is_not_modified, latest_change, make_etag, not_modified_response, set_validators
+from .expiry import next_end, not_ended_filter
+from .fields import FieldSet, InvalidFields
+from .images import InvalidImage, image_url, store_data_url
+from .mongo import get_events_collection
+from .pagination import cursor_for, decode_cursor, keyset_filter, parse_positive_int
+from .streaming import streaming_json_response, wants_stream
+
 load_dotenv()
 
 # Constants
-MONGODB_URI = os.getenv('MONGODB_URI')
-MONGODB_DATABASE = os.getenv('MONGODB_DATABASE')
-SECRET_KEY = os.getenv('SECRET_KEY')
+# Largest page of get_events
+MAX_LIMIT = 50
 
-def get_events_collection():
-    try:
-        client = MongoClient(MONGODB_URI)
-        db = client[MONGODB_DATABASE]
-        return client, db.events
-    except PyMongoError as e:
-        raise Exception(f"Database connection error: {str(e)}")
+# Newest first
+EVENTS_SORT = [('created_at', -1), ('_id', -1)]
 
-def verify_jwt_token(request):
-    try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return None
-        token = auth_header.split(' ')[1]
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
+# Fields selectable with ?fields= on event listings; image bytes are never loaded
+EVENT_FIELDS = FieldSet({
+    'id': ((), lambda event, request: str(event['_id'])),
+    'image': (('image_id', 'image_url'), lambda event, request: image_url(request, event)),
+    'type': (('type',), lambda event, request: event['type']),
+    'title': (('title',), lambda event, request: event['title']),
+    'date': (('display_date',), lambda event, request: event['display_date']),
+    'location': (('venue',), lambda event, request: event['venue']),
+    'cost': (('cost',), lambda event, request: event['cost']),
+    'description': (('description',), lambda event, request: event['description']),
+    'category': (('category',), lambda event, request: event.get('category', 'other')),
+    'start_date': (('start_date',), lambda event, request: event['start_date']),
+    'start_time': (('start_time',), lambda event, request: event['start_time']),
+    'end_date': (('end_date',), lambda event, request: event['end_date']),
+    'end_time': (('end_time',), lambda event, request: event['end_time']),
+    'admin_name': (('admin_name',), lambda event, request: event.get('admin_name', '')),
+    'capacity': (('capacity',), lambda event, request: event.get('capacity')),
+}, default=('id', 'image', 'type', 'title', 'date', 'location', 'cost', 'description'))
+
+# get_admin_events adds the registration counters kept on each event (see counters.py)
+ADMIN_EVENT_FIELDS = FieldSet({
+    **EVENT_FIELDS.fields,
+    'registrations': (('registration_stats',), lambda event, request: render_stats(event)),
+    'seats_taken': (('seats_taken',), lambda event, request: event.get('seats_taken', 0)),
+}, default=EVENT_FIELDS.default + ('capacity', 'seats_taken', 'registrations'))
+
+# Rendered get_events pages
+EVENT_LIST_CACHE = VersionedCache(
+    maxsize=settings.EVENT_LIST_CACHE_SIZE,
+    ttl=settings.EVENT_LIST_CACHE_TTL,
+    stale_ttl=settings.EVENT_LIST_CACHE_STALE_TTL,
+    version_func=get_catalog_version,
+)
+
+def build_schedule_fields(start_date, start_time, end_date, end_time):
+    """Native datetimes and pre-rendered display text for an event's schedule.
+
+    Raises ValueError if the date or time strings are malformed.
+    """
+    start_at = datetime.strptime(f"{start_date} {start_time}", "%Y-%m-%d %H:%M")
+    end_at = datetime.strptime(f"{end_date} {end_time}", "%Y-%m-%d %H:%M")
+    return {
+        'start_at': start_at,
+        'end_at': end_at,
+        'display_date': f"{start_at.strftime('%A, %B %d')}, {start_at.strftime('%I:%M%p')}",
+    }
 
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def create_event(request):
     try:
-        payload = verify_jwt_token(request)
+        payload = get_token_claims(request)
         if not payload or payload.get('user_type') != 'admin':
             return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -93,9 +131,8 @@ def create_event(request):
 
         # Validate dates
         try:
-            start_datetime = datetime.strptime(f"{start_date} {start_time}", "%Y-%m-%d %H:%M")
-            end_datetime = datetime.strptime(f"{end_date} {end_time}", "%Y-%m-%d %H:%M")
-            if end_datetime <= start_datetime:
+            schedule = build_schedule_fields(start_date, start_time, end_date, end_time)
+            if schedule['end_at'] <= schedule['start_at']:
                 return Response({'error': 'End date and time must be after start date and time'}, status=status.HTTP_400_BAD_REQUEST)
         except ValueError:
             return Response({'error': 'Invalid date or time format'}, status=status.HTTP_400_BAD_REQUEST)
@@ -111,8 +148,25 @@ def create_event(request):
         else:
             cost_float = 0
 
+        # Optional seat limit; without one registrations are never waitlisted
+        capacity = data.get('capacity')
+        if capacity in (None, ''):
+            capacity = None
+        else:
+            try:
+                capacity = int(capacity)
+            except (ValueError, TypeError):
+                return Response({'error': 'Invalid capacity format'}, status=status.HTTP_400_BAD_REQUEST)
+            if capacity < 1:
+                return Response({'error': 'Capacity must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            image_fields = store_data_url(event_image)
+        except InvalidImage as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            client, events = get_events_collection()
+            events = get_events_collection()
             event_data = {
                 'title': event_title,
                 'venue': event_venue,
@@ -120,11 +174,14 @@ def create_event(request):
                 'end_time': end_time,
                 'start_date': start_date,
                 'end_date': end_date,
+                **schedule,
                 'cost': cost_float,
                 'description': event_description,
-                'image': event_image,  # Store base64 image
+                **image_fields,  # Image bytes live in GridFS, deduplicated by content hash
                 'type': event_type,
                 'category': event_category,
+                'capacity': capacity,
+                'seats_taken': 0,
                 'admin_id': payload['admin_id'],
                 'admin_name': payload.get('name', ''),
                 'created_at': datetime.utcnow(),
@@ -134,6 +191,7 @@ def create_event(request):
 
             result = events.insert_one(event_data)
             event_data['_id'] = result.inserted_id
+            bump_catalog_version()
 
             return Response({
                 'message': 'Event created successfully',
@@ -145,77 +203,100 @@ def create_event(request):
                     'start_time': event_data['start_time'],
                     'cost': event_data['cost'],
                     'type': event_data['type'],
-                    'image': event_data['image'],
+                    'capacity': event_data['capacity'],
+                    'image': image_url(request, event_data, variant='detail'),
                 }
             }, status=status.HTTP_201_CREATED)
 
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
 
     except json.JSONDecodeError:
         return Response({'error': 'Invalid JSON data'}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _list_events_page(request, page, limit, after, include_total, fields):
+    # Ended events are filtered out here and flipped to inactive by the expiry sweeper
+    listed = {'status': 'active', **not_ended_filter()}
+    query = {'$and': [listed, keyset_filter(EVENTS_SORT, after)]} if after else listed
+
+    events = get_events_collection()
+    projection = EVENT_FIELDS.projection(fields, extra=('created_at',))
+    events_cursor = events.find(query, projection).sort(EVENTS_SORT)
+    if after is None:
+        events_cursor = events_cursor.skip((page - 1) * limit)
+    page_events = list(events_cursor.limit(limit + 1))
+    has_more = len(page_events) > limit
+    page_events = page_events[:limit]
+    events_list = []
+
+    for event in page_events:
+        events_list.append(EVENT_FIELDS.render(event, fields, request))
+
+    pagination = {
+        'limit': limit,
+        'has_more': has_more,
+        'next_cursor': cursor_for(page_events[-1], EVENTS_SORT) if has_more else None
+    }
+    if after is None:
+        pagination['page'] = page
+    if include_total:
+        pagination['total'] = get_active_event_count(events, listed)
+
+    return {
+        'events': events_list,
+        'pagination': pagination
+    }
+
+def _events_validators(request):
+    # Ending drops an event from the listing without touching updated_at, so the next end is part of the tag
+    events = get_events_collection()
+    last_modified = latest_change(events, {})
+    etag = make_etag('events', last_modified, next_end(events), request.get_host(), sorted(request.GET.lists()))
+    return etag, last_modified
+
+def _cached_events_page(request, page, limit, after, include_total, fields):
+    # Validators are read before the page so a concurrent write can only make them older, never newer
+    etag, last_modified = _events_validators(request)
+    data = _list_events_page(request, page, limit, after, include_total, fields)
+    return data, etag, last_modified
+
 @csrf_exempt
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_events(request):
     try:
-        page = int(request.GET.get('page', 1))
-        limit = int(request.GET.get('limit', 9))
-        skip = (page - 1) * limit
+        # Cursor mode: `after` holds the next_cursor of the previous page (empty for the first page)
+        after = request.GET.get('after')
+        include_total = after is None or request.GET.get('include_total', '').lower() in ('1', 'true')
 
         try:
-            client, events = get_events_collection()
-            events_cursor = events.find({'status': 'active'}).sort('created_at', -1).skip(skip).limit(limit)
-            events_list = []
+            page = parse_positive_int(request, 'page', 1)
+            limit = parse_positive_int(request, 'limit', 9, MAX_LIMIT)
+            fields = EVENT_FIELDS.parse(request)
+            if after:
+                decode_cursor(after, len(EVENTS_SORT))
+        except ValueError as e:  # InvalidCursor, InvalidFields or a bad page or limit
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            now = datetime.utcnow()
-            for event in events_cursor:
-                # Combine end_date and end_time to get event deadline
-                try:
-                    event_deadline = datetime.strptime(f"{event['end_date']} {event['end_time']}", "%Y-%m-%d %H:%M")
-                except Exception:
-                    event_deadline = None
-                # If deadline passed, set status to inactive
-                if event_deadline and event_deadline < now:
-                    events.update_one({'_id': event['_id']}, {'$set': {'status': 'inactive'}})
-                    continue
-                formatted_date = datetime.strptime(event['start_date'], '%Y-%m-%d').strftime('%A, %B %d')
-                formatted_time = datetime.strptime(event['start_time'], '%H:%M').strftime('%I:%M%p')
-                events_list.append({
-                    'id': str(event['_id']),
-                    'image': event.get('image', event.get('image_url', '')),
-                    'type': event['type'],
-                    'title': event['title'],
-                    'date': f"{formatted_date}, {formatted_time}",
-                    'location': event['venue'],
-                    'cost': event['cost'],
-                    'description': event['description']
-                })
-
-            total_events = events.count_documents({'status': 'active'})
-            has_more = (page * limit) < total_events
-
-            return Response({
-                'events': events_list,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': total_events,
-                    'has_more': has_more
-                }
-            }, status=status.HTTP_200_OK)
+        try:
+            # Every anonymous visitor gets the same pages; image URLs depend on the host.
+            # Revalidation is answered from the cached entry's validators, so Mongo is only read on a miss
+            cache_key = (request.get_host(), tuple((name, tuple(values)) for name, values in sorted(request.GET.lists())))
+            (data, etag, last_modified), outcome = EVENT_LIST_CACHE.get_or_compute(
+                cache_key,
+                lambda: _cached_events_page(request, page, limit, after, include_total, fields)
+            )
+            if is_not_modified(request, etag, last_modified):
+                response = not_modified_response(etag, last_modified)
+            else:
+                response = set_validators(Response(data, status=status.HTTP_200_OK), etag, last_modified)
+            response['X-Cache'] = outcome
+            return response
 
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
 
     except Exception as e:
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -225,50 +306,56 @@ def get_events(request):
 @permission_classes([AllowAny])
 def get_admin_events(request):
     try:
-        payload = verify_jwt_token(request)
+        payload = get_token_claims(request)
         if not payload or payload.get('user_type') != 'admin':
             return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_401_UNAUTHORIZED)
 
         try:
-            client, events = get_events_collection()
+            fields = ADMIN_EVENT_FIELDS.parse(request)
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            events = get_events_collection()
+            # Any create or status change of this admin's events moves updated_at, any registration stats_updated_at
+            last_event_change = latest_change(events, {'admin_id': payload['admin_id']})
+            last_stats_change = latest_change(events, {'admin_id': payload['admin_id']}, 'stats_updated_at')
+            # Ending drops an event from the list without touching either timestamp
+            upcoming_end = next_end(events, {'admin_id': payload['admin_id']})
+            last_modified = max(filter(None, [last_event_change, last_stats_change]), default=None)
+            etag = make_etag(
+                'admin_events', payload['admin_id'], last_event_change, last_stats_change, upcoming_end,
+                request.get_host(), sorted(request.GET.lists())
+            )
+            if is_not_modified(request, etag, last_modified):
+                return not_modified_response(etag, last_modified, private=True)
+
             events_cursor = events.find({
                 'admin_id': payload['admin_id'],
-                'status': 'active'
-            }).sort('created_at', -1)
+                'status': 'active',
+                **not_ended_filter()
+            }, ADMIN_EVENT_FIELDS.projection(fields)).sort('created_at', -1)
+
+            if wants_stream(request):
+                events_cursor = events_cursor.batch_size(settings.STREAM_BATCH_SIZE)
+                response = streaming_json_response(
+                    'events',
+                    (ADMIN_EVENT_FIELDS.render(event, fields, request) for event in events_cursor)
+                )
+                return set_validators(response, etag, last_modified, private=True)
+
             events_list = []
 
-            now = datetime.utcnow()
             for event in events_cursor:
-                try:
-                    event_deadline = datetime.strptime(f"{event['end_date']} {event['end_time']}", "%Y-%m-%d %H:%M")
-                except Exception:
-                    event_deadline = None
-                if event_deadline and event_deadline < now:
-                    events.update_one({'_id': event['_id']}, {'$set': {'status': 'inactive'}})
-                    continue
-                formatted_date = datetime.strptime(event['start_date'], '%Y-%m-%d').strftime('%A, %B %d')
-                formatted_time = datetime.strptime(event['start_time'], '%H:%M').strftime('%I:%M%p')
-                events_list.append({
-                    'id': str(event['_id']),
-                    'image': event.get('image', event.get('image_url', '')),
-                    'type': event['type'],
-                    'title': event['title'],
-                    'date': f"{formatted_date}, {formatted_time}",
-                    'location': event['venue'],
-                    'cost': event['cost'],
-                    'description': event['description']
-                })
+                events_list.append(ADMIN_EVENT_FIELDS.render(event, fields, request))
 
-            return Response({
+            return set_validators(Response({
                 'events': events_list,
                 'count': len(events_list)
-            }, status=status.HTTP_200_OK)
+            }, status=status.HTTP_200_OK), etag, last_modified, private=True)
 
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
 
     except Exception as e:
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
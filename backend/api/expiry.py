@@ -0,0 +1,63 @@
+# Event expiry: query filters for events that have not ended and a bulk sweeper for those that have
+import threading
+from datetime import datetime
+
+from .catalog import bump_catalog_version
+from .mongo import get_events_collection
+
+_sweeper = None
+_stop = threading.Event()
+
+
+def not_ended_filter(now=None):
+    """Mongo filter for events whose end_at is still ahead"""
+    return {'end_at': {'$gt': now or datetime.utcnow()}}
+
+
+def ended_filter(now=None):
+    return {'end_at': {'$lte': now or datetime.utcnow()}}
+
+
+def next_end(collection, query=None, now=None):
+    """Soonest end_at among listed (active, not ended) events matching `query`, read from an index"""
+    document = collection.find_one(
+        {'status': 'active', **(query or {}), **not_ended_filter(now)},
+        {'end_at': 1, '_id': 0},
+        sort=[('end_at', 1)]
+    )
+    return document.get('end_at') if document else None
+
+
+def expire_events(now=None):
+    """Mark every active event that has ended as inactive in one update_many"""
+    now = now or datetime.utcnow()
+    result = get_events_collection().update_many(
+        {'status': 'active', **ended_filter(now)},
+        {'$set': {'status': 'inactive', 'updated_at': now}}
+    )
+    return result.modified_count
+
+
+def _sweep_forever(interval, stop):
+    while not stop.wait(interval):
+        try:
+            if expire_events():
+                # Only this process's caches; others pick the change up when their entries expire
+                bump_catalog_version()
+        except Exception as e:
+            print(f"Event expiry sweep failed: {str(e)}")
+
+
+def start_expiry_sweeper(interval):
+    """Run expire_events every `interval` seconds on a daemon thread (once per process)"""
+    global _sweeper
+    if _sweeper is not None and _sweeper.is_alive():
+        return _sweeper
+    _stop.clear()
+    _sweeper = threading.Thread(target=_sweep_forever, args=(interval, _stop), name='event-expiry-sweeper', daemon=True)
+    _sweeper.start()
+    return _sweeper
+
+
+def stop_expiry_sweeper():
+    _stop.set()
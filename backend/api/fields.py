@@ -0,0 +1,37 @@
+# Sparse fieldsets (?fields=a,b,c) mapped onto Mongo projections for list endpoints
+class InvalidFields(ValueError):
+    pass
+
+
+class FieldSet:
+    """Output fields of a list endpoint.
+
+    `fields` maps each output name to (source document fields, getter), where
+    getter(document, request) renders the value. `default` is what clients get
+    without ?fields=; 'id' is always returned.
+    """
+
+    def __init__(self, fields, default):
+        self.fields = fields
+        self.default = tuple(default)
+
+    def parse(self, request):
+        requested = request.GET.get('fields')
+        if not requested:
+            return self.default
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise InvalidFields(f"Unknown field(s): {', '.join(unknown)}")
+        if 'id' in self.fields and 'id' not in names:
+            names.insert(0, 'id')
+        return tuple(dict.fromkeys(names))
+
+    def projection(self, names, extra=()):
+        projection = {'_id': 1}
+        projection.update({source: 1 for name in names for source in self.fields[name][0]})
+        projection.update({source: 1 for source in extra})
+        return projection
+
+    def render(self, document, names, request):
+        return {name: self.fields[name][1](document, request) for name in names}
@@ -0,0 +1,99 @@
+# Resized, re-encoded variants of uploaded event images, rendered off the request thread
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; without it only originals are served
+    Image = None
+
+# Bounding boxes (width, height); images are shrunk to fit, never enlarged
+IMAGE_VARIANTS = {
+    'thumb': (480, 320),
+    'detail': (1280, 960),
+}
+LIST_VARIANT = 'thumb'
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def variant_filename(digest, variant):
+    return f'{digest}.{variant}'
+
+
+def render_variants(content):
+    """Return {variant: (bytes, content_type)} for image bytes; runs in a worker process"""
+    webp = features.check('webp')
+    rendered = {}
+    with Image.open(io.BytesIO(content)) as source:
+        source.load()
+        has_alpha = source.mode in ('RGBA', 'LA') or (source.mode == 'P' and 'transparency' in source.info)
+        base = source.convert('RGBA' if has_alpha else 'RGB')
+    for variant, box in IMAGE_VARIANTS.items():
+        image = base.copy()
+        image.thumbnail(box, Image.LANCZOS)
+        output = io.BytesIO()
+        if webp:
+            image.save(output, 'WEBP', quality=80, method=4)
+            content_type = 'image/webp'
+        else:
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.save(output, 'JPEG', quality=82, optimize=True, progressive=True)
+            content_type = 'image/jpeg'
+        rendered[variant] = (output.getvalue(), content_type)
+    return rendered
+
+
+def get_executor():
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # Spawned rather than forked: the server process runs Mongo monitor and sweeper threads
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _executor_pid = os.getpid()
+    return _executor
+
+
+def store_variants(bucket, digest, rendered):
+    for variant, (data, content_type) in rendered.items():
+        bucket.upload_from_stream(
+            variant_filename(digest, variant), data,
+            metadata={'content_type': content_type, 'source': digest, 'variant': variant}
+        )
+
+
+def generate_variants(bucket, digest, content):
+    """Render and store every variant synchronously (used by the backfill command)"""
+    if Image is None:
+        return False
+    store_variants(bucket, digest, render_variants(content))
+    return True
+
+
+def schedule_variants(bucket, digest, content):
+    """Render variants in the process pool and store them when done; returns immediately.
+
+    Until the variants exist the image endpoint falls back to the original.
+    """
+    if Image is None or settings.IMAGE_VARIANT_WORKERS <= 0:
+        return None
+    future = get_executor().submit(render_variants, content)
+
+    def _store(done):
+        try:
+            store_variants(bucket, digest, done.result())
+        except Exception as e:
+            print(f"Image variant generation failed for {digest}: {str(e)}")
+
+    future.add_done_callback(_store)
+    return future
@@ -0,0 +1,197 @@
+# Content-addressed event image store on GridFS and the image download endpoint
+import base64
+import binascii
+import hashlib
+import io
+import re
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from pymongo.errors import PyMongoError
+
+from .image_variants import IMAGE_VARIANTS, LIST_VARIANT, schedule_variants, variant_filename
+from .mongo import get_database, get_events_collection
+
+IMAGE_BUCKET = 'event_images'
+DATA_URL_REGEX = re.compile(r'^data:(image/[\w.+-]+);base64,(.*)$', re.DOTALL)
+RANGE_REGEX = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Content never changes under a given hash, so clients may cache hash-versioned URLs for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unversioned URLs may start serving other bytes (migration, a replaced image); revalidate by ETag
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+# Served in place of a variant that is still being rendered, so clients retry soon
+PENDING_VARIANT_CACHE_CONTROL = 'public, max-age=60'
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def get_image_bucket():
+    return GridFSBucket(get_database(), bucket_name=IMAGE_BUCKET)
+
+
+def parse_data_url(data_url):
+    match = DATA_URL_REGEX.match(data_url)
+    if not match:
+        raise InvalidImage('Invalid image format. Must be base64 encoded.')
+    try:
+        content = base64.b64decode(match.group(2), validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidImage('Invalid image format. Must be base64 encoded.')
+    return match.group(1), content
+
+
+def store_image(content, content_type):
+    """Store image bytes once per distinct content and return their SHA-256 hex digest.
+
+    Files are named by digest. Two concurrent uploads of the same bytes may both
+    be stored; downloads always pick the newest revision, so that is harmless.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    bucket = get_image_bucket()
+    if get_database()[f'{IMAGE_BUCKET}.files'].find_one({'filename': digest}, {'_id': 1}) is None:
+        bucket.upload_from_stream(digest, content, metadata={'content_type': content_type})
+        schedule_variants(bucket, digest, content)
+    return digest
+
+
+def store_data_url(data_url):
+    """Store a base64 data:image URL; returns the fields to set on the event document"""
+    content_type, content = parse_data_url(data_url)
+    return {'image_id': store_image(content, content_type), 'image_type': content_type}
+
+
+def image_url(request, event, variant=LIST_VARIANT):
+    """Absolute URL of an event's image, versioned by content hash so it can be cached forever.
+
+    Listings use the thumbnail variant; pass variant=None for the original upload.
+    Only _id, image_id and image_url are read, so callers can project away everything else.
+    """
+    if not event.get('image_id') and event.get('image_url'):
+        # Older events link to an externally hosted image
+        return event['image_url']
+    path = reverse('get_event_image', args=[str(event['_id'])])
+    if not event.get('image_id'):
+        # Image still embedded in the document; the endpoint serves it until it is migrated
+        return request.build_absolute_uri(path)
+    query = f"v={event['image_id'][:16]}" + (f"&variant={variant}" if variant else '')
+    return request.build_absolute_uri(f"{path}?{query}")
+
+
+def _parse_range(header, size):
+    # Single byte range only; returns (start, end) inclusive, None to ignore, or False if unsatisfiable
+    match = RANGE_REGEX.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(source, start, length, chunk_size=255 * 1024):
+    source.seek(start)
+    remaining = length
+    while remaining > 0:
+        data = source.read(min(chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+@require_http_methods(['GET', 'HEAD'])
+def get_event_image(request, event_id):
+    try:
+        event = get_events_collection().find_one(
+            {'_id': ObjectId(event_id)},
+            {'image_id': 1, 'image_type': 1, 'image': 1}
+        )
+    except InvalidId:
+        return HttpResponse(status=404)
+    except PyMongoError:
+        return HttpResponse(status=503)
+    if not event:
+        return HttpResponse(status=404)
+
+    variant = request.GET.get('variant')
+    cache_control = REVALIDATE_CACHE_CONTROL
+    try:
+        if event.get('image_id'):
+            digest = event['image_id']
+            if request.GET.get('v') == digest[:16]:
+                cache_control = IMMUTABLE_CACHE_CONTROL
+            bucket = get_image_bucket()
+            source = None
+            if variant in IMAGE_VARIANTS:
+                try:
+                    source = bucket.open_download_stream_by_name(variant_filename(digest, variant))
+                    digest = variant_filename(digest, variant)
+                    content_type = source.metadata['content_type']
+                except NoFile:
+                    cache_control = PENDING_VARIANT_CACHE_CONTROL
+            if source is None:
+                source = bucket.open_download_stream_by_name(digest)
+                content_type = event.get('image_type') or (source.metadata or {}).get('content_type', 'application/octet-stream')
+            size = source.length
+        elif (event.get('image') or '').startswith('data:image'):
+            content_type, content = parse_data_url(event['image'])
+            digest = hashlib.sha256(content).hexdigest()
+            source = io.BytesIO(content)
+            size = len(content)
+        else:
+            return HttpResponse(status=404)
+    except (NoFile, InvalidImage):
+        return HttpResponse(status=404)
+    except PyMongoError:
+        return HttpResponse(status=503)
+
+    etag = f'"{digest}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+        'X-Content-Type-Options': 'nosniff',
+        'Content-Security-Policy': "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+    }
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        response = HttpResponse(status=304)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    start, end = 0, size - 1
+    status_code = 200
+    range_header = request.headers.get('Range')
+    if range_header and request.headers.get('If-Range', etag) == etag and size:
+        byte_range = _parse_range(range_header, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    length = end - start + 1 if size else 0
+    body = [] if request.method == 'HEAD' else _read_range(source, start, length)
+    response = StreamingHttpResponse(body, status=status_code, content_type=content_type)
+    response['Content-Length'] = str(length)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
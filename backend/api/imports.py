@@ -0,0 +1,272 @@
+# Bulk participant import (CSV or NDJSON) for admins, written in unordered bulk chunks
+import codecs
+import csv
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework import status
+
+from .accounts import EMAIL_COLLATION, normalize_email
+from .authentication import auth_error, get_token_claims
+from .mongo import get_events_collection, get_registrations_collection, get_users_collection
+from .counters import bulk_counter_increments, registration_delta
+from .registrations import CONFIRMED, search_key
+from .users import validate_email
+
+# Per-row errors returned in the response; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+DUPLICATE_KEY = 11000
+
+# Accepted spellings of each column (CSV headers and NDJSON keys)
+COLUMN_ALIASES = {
+    'user_name': ('user_name', 'name'),
+    'user_email': ('user_email', 'email'),
+    'phone_number': ('phone_number', 'phone'),
+    'payment_status': ('payment_status',),
+    'payment_method': ('payment_method',),
+}
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def _lines(request):
+    """Decoded text lines of the upload, read incrementally"""
+    if request.content_type.startswith('multipart/form-data'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return None, None
+        name = upload.name.lower()
+        file_format = 'ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv'
+        raw = iter(upload)
+    else:
+        file_format = 'ndjson' if 'ndjson' in request.content_type or 'jsonl' in request.content_type else 'csv'
+        raw = iter(request.stream.readline, b'') if request.stream is not None else iter(())
+    return file_format, codecs.iterdecode(raw, 'utf-8-sig')
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _ndjson_rows(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, InvalidRow('Invalid JSON')
+            continue
+        yield number, row if isinstance(row, dict) else InvalidRow('Each line must be a JSON object')
+
+
+def _column(row, name):
+    for alias in COLUMN_ALIASES[name]:
+        value = row.get(alias)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def clean_row(row):
+    """Validated participant fields of one input row; raises InvalidRow"""
+    if isinstance(row, InvalidRow):
+        raise row
+    user_name = _column(row, 'user_name')
+    user_email = _column(row, 'user_email').lower()
+    if not user_name:
+        raise InvalidRow('Name is required')
+    if not user_email or not validate_email(user_email):
+        raise InvalidRow('A valid email is required')
+    return {
+        'user_name': user_name,
+        'user_name_key': search_key(user_name),
+        'user_email': user_email,
+        'phone_number': _column(row, 'phone_number'),
+        'payment_status': _column(row, 'payment_status') or 'pending',
+        'payment_method': _column(row, 'payment_method') or 'none',
+    }
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors = []
+        self.truncated = False  # The upload could not be read to the end
+
+    def error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'file_truncated': self.truncated,
+        }
+
+
+def _write_chunk(registrations, users, event_id, event, chunk, report):
+    """Upsert one chunk of (row number, fields); existing registrations are left untouched.
+
+    Returns the registration counter changes of the rows that were inserted.
+    """
+    # Attendees with an account are linked to it; others are keyed by email
+    emails = [fields['user_email'] for _, fields in chunk]
+    user_ids = {
+        normalize_email(user['email']): str(user['_id'])
+        for user in users.find({'email': {'$in': emails}}, {'email': 1}, collation=EMAIL_COLLATION)
+    }
+    now = datetime.utcnow()
+    operations = []
+    for _, fields in chunk:
+        user_id = user_ids.get(fields['user_email'], f"email:{fields['user_email']}")
+        operations.append(UpdateOne(
+            {'event_id': event_id, 'user_id': user_id},
+            {'$setOnInsert': {
+                **fields,
+                'event_id': event_id,
+                'event_title': event['title'],
+                'user_id': user_id,
+                'registration_date': now,
+                'event_type': event['type'],
+                'event_cost': event['cost'],
+                'status': CONFIRMED,
+                'imported': True
+            }},
+            upsert=True
+        ))
+
+    try:
+        result = registrations.bulk_write(operations, ordered=False)
+        upserted_indexes = list(result.upserted_ids)
+        write_errors = []
+    except BulkWriteError as e:
+        upserted_indexes = [upsert['index'] for upsert in e.details.get('upserted', [])]
+        write_errors = e.details.get('writeErrors', [])
+    upserted = len(upserted_indexes)
+
+    failed = 0
+    for error in write_errors:
+        row_number = chunk[error['index']][0]
+        if error.get('code') == DUPLICATE_KEY:
+            continue  # Registered concurrently; same outcome as an existing registration
+        failed += 1
+        report.error(row_number, error.get('errmsg', 'Write failed'))
+    report.imported += upserted
+    report.duplicates += len(chunk) - upserted - failed
+
+    counts = {}
+    for index in upserted_indexes:
+        for name, count in registration_delta(chunk[index][1]['payment_status']).items():
+            counts[name] = counts.get(name, 0) + count
+    return counts
+
+
+def import_rows(event_id, event, rows):
+    """Validate rows as they are read and write them in chunks of IMPORT_CHUNK_SIZE"""
+    registrations = get_registrations_collection()
+    users = get_users_collection()
+    events = get_events_collection()
+    report = ImportReport()
+    chunk = []
+    seen = set()
+
+    def flush():
+        counts = _write_chunk(registrations, users, event_id, event, chunk, report)
+        if counts:
+            # Imported attendees hold seats; admins may fill an event past its capacity
+            events.update_one(
+                {'_id': event['_id']},
+                {
+                    '$inc': {'seats_taken': counts['total'], **bulk_counter_increments(counts, event['cost'])},
+                    '$set': {'stats_updated_at': datetime.utcnow()}
+                }
+            )
+        chunk.clear()
+
+    last_row = 0
+    try:
+        for row_number, row in rows:
+            last_row = row_number
+            report.processed += 1
+            try:
+                fields = clean_row(row)
+            except InvalidRow as e:
+                report.error(row_number, str(e))
+                continue
+            if fields['user_email'] in seen:
+                report.duplicates += 1
+                continue
+            seen.add(fields['user_email'])
+            chunk.append((row_number, fields))
+            if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+                flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Rows read so far are kept; the report says where reading stopped
+        report.error(last_row + 1, f'Could not read the rest of the file: {str(e)}')
+        report.truncated = True
+    if chunk:
+        flush()
+    return report
+
+
+@csrf_exempt
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def import_participants(request, event_id):
+    try:
+        payload = get_token_claims(request)
+        if payload is None:
+            return Response({'error': auth_error(request)}, status=status.HTTP_401_UNAUTHORIZED)
+        if payload.get('user_type') != 'admin':
+            return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            event_oid = ObjectId(event_id)
+        except InvalidId:
+            return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        file_format, lines = _lines(request)
+        if lines is None:
+            return Response({'error': 'Upload a CSV or NDJSON file in the "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            event = get_events_collection().find_one(
+                {'_id': event_oid},
+                {'title': 1, 'type': 1, 'cost': 1}
+            )
+            if not event:
+                return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            rows = _ndjson_rows(lines) if file_format == 'ndjson' else _csv_rows(lines)
+            report = import_rows(event_id, event, rows)
+            return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+        except PyMongoError as e:
+            return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    except Exception as e:
+        return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
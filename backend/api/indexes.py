@@ -0,0 +1,120 @@
+# Declared MongoDB indexes for every collection the api app queries
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from .accounts import EMAIL_COLLATION
+from .mongo import get_collection
+
+# Options that make two indexes with the same name different from each other
+COMPARED_OPTIONS = ('unique', 'sparse', 'partialFilterExpression', 'collation', 'expireAfterSeconds', 'weights')
+
+INDEXES = {
+    'events': [
+        # get_events: active events, newest first, keyset-paginated on (created_at, _id)
+        IndexModel([('status', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], name='status_created_at_id'),
+        # get_admin_events: an admin's active events, newest first
+        IndexModel([('admin_id', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING)], name='admin_status_created_at'),
+        # Conditional GET validators: newest change overall, per admin and of an admin's registration counters
+        IndexModel([('updated_at', DESCENDING)], name='updated_at'),
+        IndexModel([('admin_id', ASCENDING), ('updated_at', DESCENDING)], name='admin_updated_at'),
+        IndexModel([('admin_id', ASCENDING), ('stats_updated_at', DESCENDING)], name='admin_stats_updated_at'),
+        # Expiry sweep and end-date range queries
+        IndexModel([('status', ASCENDING), ('end_at', ASCENDING)], name='status_end_at'),
+        # search_events: keywords ranked by field, and the filter-only searches newest first
+        IndexModel(
+            [('title', TEXT), ('venue', TEXT), ('description', TEXT)],
+            name='event_text', weights={'title': 10, 'venue': 5, 'description': 1}, default_language='english'
+        ),
+        IndexModel([('status', ASCENDING), ('category', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], name='status_category_created_at_id'),
+        IndexModel([('status', ASCENDING), ('type', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], name='status_type_created_at_id'),
+        IndexModel([('status', ASCENDING), ('start_at', ASCENDING)], name='status_start_at'),
+    ],
+    'registrations': [
+        # get_event_participants: newest first, keyset-paginated on (registration_date, _id)
+        IndexModel([('event_id', ASCENDING), ('registration_date', DESCENDING), ('_id', DESCENDING)], name='event_registration_date_id'),
+        # ... filtered by payment status
+        IndexModel([('event_id', ASCENDING), ('payment_status', ASCENDING), ('registration_date', DESCENDING), ('_id', DESCENDING)], name='event_payment_registration_date_id'),
+        # ... searched by name or email prefix
+        IndexModel([('event_id', ASCENDING), ('user_name_key', ASCENDING)], name='event_user_name_key'),
+        IndexModel([('event_id', ASCENDING), ('user_email', ASCENDING)], name='event_user_email'),
+        # get_user_registered_events
+        IndexModel([('user_id', ASCENDING), ('registration_date', DESCENDING)], name='user_registration_date'),
+        # register_for_event: one registration per user and event, enforced on insert
+        IndexModel([('event_id', ASCENDING), ('user_id', ASCENDING)], name='event_user_unique', unique=True),
+    ],
+    # Signup relies on these for duplicate detection; lookups must pass EMAIL_COLLATION
+    'users': [
+        IndexModel([('email', ASCENDING)], name='email_ci_unique', unique=True, collation=EMAIL_COLLATION),
+    ],
+    'admins': [
+        IndexModel([('email', ASCENDING)], name='email_ci_unique', unique=True, collation=EMAIL_COLLATION),
+    ],
+    # Same index GridFS creates on first upload; images are looked up by content hash filename
+    'event_images.files': [
+        IndexModel([('filename', ASCENDING), ('uploadDate', ASCENDING)], name='filename_1_uploadDate_1'),
+    ],
+}
+
+
+def _option_matches(declared, live):
+    # Servers echo defaulted sub-options (e.g. of a collation), so only compare what was declared
+    if hasattr(declared, 'document'):
+        declared = declared.document
+    if isinstance(declared, dict) and isinstance(live, dict):
+        return all(_option_matches(value, live.get(key)) for key, value in declared.items())
+    return declared == live
+
+
+def _key_pairs(key):
+    # The server stores the fields of a text index as {_fts: 'text', _ftsx: 1}; they are compared via weights
+    pairs = []
+    for field, direction in key:
+        if direction == TEXT:
+            if ('_fts', TEXT) not in pairs:
+                pairs += [('_fts', TEXT), ('_ftsx', 1)]
+        else:
+            pairs.append((field, direction))
+    return pairs
+
+
+def _index_matches(declared, live):
+    if _key_pairs(declared['key'].items()) != [tuple(pair) for pair in live['key']]:
+        return False
+    return all(
+        _option_matches(declared.get(option), live.get(option))
+        for option in COMPARED_OPTIONS
+        if option in declared or option in live
+    )
+
+
+def get_index_drift(collection_name):
+    """Compare declared and live indexes of one collection.
+
+    Returns a dict with the names of indexes that are missing, undeclared
+    (present only in the database) and changed (same name, different spec).
+    """
+    declared = {model.document['name']: model.document for model in INDEXES[collection_name]}
+    live = get_collection(collection_name).index_information()
+    live.pop('_id_', None)
+    return {
+        'missing': sorted(name for name in declared if name not in live),
+        'undeclared': sorted(name for name in live if name not in declared),
+        'changed': sorted(
+            name for name in declared
+            if name in live and not _index_matches(declared[name], live[name])
+        ),
+    }
+
+
+def ensure_indexes(collection_name, names=None):
+    """Create the declared indexes of one collection, building them in the background"""
+    models = []
+    for model in INDEXES[collection_name]:
+        document = dict(model.document)
+        if names is not None and document['name'] not in names:
+            continue
+        keys = list(document.pop('key').items())
+        document.setdefault('background', True)
+        models.append(IndexModel(keys, **document))
+    if not models:
+        return []
+    return get_collection(collection_name).create_indexes(models)
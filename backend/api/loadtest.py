@@ -0,0 +1,481 @@
+# Load-test harness: asyncio HTTP/1.1 client, weighted route mixes and latency reports (see the loadtest command)
+import asyncio
+import json
+import math
+import random
+import re
+import secrets
+import ssl
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from .mongo import get_admins_collection, get_events_collection, get_registrations_collection, get_users_collection
+
+# 1x1 PNG, the smallest image create_event accepts
+PIXEL_PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+EMAIL_DOMAIN = 'loadtest.example.com'
+CATEGORIES = ('music', 'tech', 'sports', 'arts', 'food')
+SEARCH_TERMS = ('festival', 'workshop', 'conference', 'concert', 'meetup')
+IMPORT_ROWS = 20
+
+Request = namedtuple('Request', 'route method path body headers expect')
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpClient:
+    """One keep-alive HTTP/1.1 connection, reopened whenever the server closes it.
+
+    `headers` are sent with every request.
+    """
+
+    def __init__(self, base_url, timeout, headers=None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.headers = headers or {}
+        self._reader = self._writer = None
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def request(self, method, path, body=b'', headers=None):
+        """(status, headers, body) of one request; raises OSError, HttpError or asyncio.TimeoutError"""
+        return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+
+    async def _request(self, method, path, body, headers):
+        lines = [f'{method} {self.prefix}{path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in {**self.headers, **headers}.items()]
+        data = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+        reused = self._writer is not None
+        if not reused:
+            await self._connect()
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+            status_line = await self._reader.readline()
+        except ConnectionError:
+            status_line = b''
+        if not status_line and reused:
+            # The server dropped the idle connection; retry once on a fresh one
+            self.close()
+            await self._connect()
+            self._writer.write(data)
+            await self._writer.drain()
+            status_line = await self._reader.readline()
+        if not status_line:
+            self.close()
+            raise HttpError('Connection closed without a response')
+
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in ('204', '304'):
+            content = b''
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            content = await self._reader.readexactly(int(response_headers['content-length']))
+        else:
+            content = await self._reader.read()
+            self.close()
+            return int(status), response_headers, content
+
+        connection = response_headers.get('connection', '').lower()
+        if connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive'):
+            self.close()
+        return int(status), response_headers, content
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self._reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while (await self._reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readline()
+
+
+def json_request(route, method, path, data=None, token=None, expect=(200,)):
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    body = json.dumps(data).encode() if data is not None else b''
+    return Request(route, method, path, body, headers, frozenset(expect))
+
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+
+class Fixture:
+    """Accounts and events created through the API for one run.
+
+    Every email and event title carries the run id, which is how teardown_fixture
+    finds them. The password is random per run.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.password = f'Lt#9{secrets.token_urlsafe(12)}'
+        self.admin_email = None
+        self.admin_token = None
+        self.users = []  # (email, token)
+        self.event_ids = []
+        self.storm_event_ids = []
+        self.signups = 0
+
+    def email(self, kind):
+        self.signups += 1
+        return f'{kind}-{self.run_id}-{self.signups}@{EMAIL_DOMAIN}'
+
+
+def event_payload(rng, title, capacity=None):
+    start = datetime.utcnow() + timedelta(days=rng.randint(1, 60))
+    event_type = rng.choice(('FREE', 'PAID'))
+    return {
+        'eventTitle': title,
+        'eventVenue': f'{rng.choice(("North", "South", "Main"))} Hall',
+        'startDate': start.strftime('%Y-%m-%d'),
+        'startTime': '18:00',
+        'endDate': start.strftime('%Y-%m-%d'),
+        'endTime': '21:00',
+        'eventCost': rng.choice((0, 10, 25)) if event_type == 'PAID' else 0,
+        'eventDescription': f'Load test {rng.choice(SEARCH_TERMS)} for {title}',
+        'eventImage': PIXEL_PNG,
+        'type': event_type,
+        'category': rng.choice(CATEGORIES),
+        'capacity': capacity,
+    }
+
+
+def signup_request(fixture, route='user_signup'):
+    kind = 'admin' if route == 'admin_signup' else 'user'
+    email = fixture.email(kind)
+    data = {'name': f'Load {kind}', 'email': email, 'password': fixture.password, 'confirmPassword': fixture.password}
+    return email, json_request(route, 'POST', f'/{kind}/signup/', data, expect=(201,))
+
+
+async def setup_fixture(client, rng, run_id, users, events, storm_events, storm_capacity):
+    """Create an admin, `users` users, `events` open events and `storm_events` small-capacity ones"""
+    fixture = Fixture(run_id)
+
+    async def send(request):
+        while True:
+            status, headers, body = await client.request(request.method, request.path, request.body, request.headers)
+            if status == 503:  # Password hashing queue full
+                await asyncio.sleep(float(headers.get('retry-after', 1)))
+                continue
+            if status not in request.expect:
+                hint = ' (pass the server\'s RATE_LIMIT_BYPASS_TOKEN)' if status == 429 else ''
+                raise HttpError(f'{request.method} {request.path} returned {status}{hint}: {body[:200]!r}')
+            return json.loads(body)
+
+    fixture.admin_email, request = signup_request(fixture, 'admin_signup')
+    fixture.admin_token = (await send(request))['token']
+    for _ in range(users):
+        email, request = signup_request(fixture)
+        fixture.users.append((email, (await send(request))['token']))
+    for number in range(events + storm_events):
+        storm = number >= events
+        data = event_payload(rng, f'{fixture.run_id} event {number}', storm_capacity if storm else None)
+        created = await send(json_request('create_event', 'POST', '/events/create/', data, fixture.admin_token, (201,)))
+        (fixture.storm_event_ids if storm else fixture.event_ids).append(created['event']['id'])
+    return fixture
+
+
+# Operations: (fixture, rng) -> Request
+def op_list_events(fixture, rng):
+    params = {'limit': rng.choice((9, 20)), 'page': rng.randint(1, 3)}
+    if rng.random() < 0.3:
+        params['category'] = rng.choice(CATEGORIES)
+    return json_request('get_events', 'GET', f'/events/?{urlencode(params)}')
+
+
+def op_search_events(fixture, rng):
+    params = {'q': rng.choice(SEARCH_TERMS), 'limit': 9}
+    if rng.random() < 0.5:
+        params['type'] = rng.choice(('FREE', 'PAID'))
+    return json_request('search_events', 'GET', f'/events/search/?{urlencode(params)}')
+
+
+def op_event_facets(fixture, rng):
+    return json_request('get_event_facets', 'GET', '/events/facets/')
+
+
+def op_event_image(fixture, rng):
+    request = json_request('get_event_image', 'GET', f'/events/{rng.choice(fixture.event_ids)}/image')
+    return request._replace(headers={'Accept': 'image/*'})
+
+
+def op_user_login(fixture, rng):
+    email, _ = rng.choice(fixture.users)
+    return json_request('user_login', 'POST', '/user/login/', {'email': email, 'password': fixture.password})
+
+
+def op_admin_login(fixture, rng):
+    return json_request('admin_login', 'POST', '/admin/login/', {'email': fixture.admin_email, 'password': fixture.password})
+
+
+def op_user_signup(fixture, rng):
+    return signup_request(fixture)[1]
+
+
+def op_admin_signup(fixture, rng):
+    return signup_request(fixture, 'admin_signup')[1]
+
+
+def op_register(fixture, rng, event_ids=None):
+    _, token = rng.choice(fixture.users)
+    data = {'payment_status': rng.choice(('pending', 'paid')), 'payment_method': 'card', 'phone_number': '5550100'}
+    event_id = rng.choice(event_ids or fixture.event_ids)
+    # 202 is a waitlisted registration, 400 a repeat registration by the same user
+    return json_request('register_for_event', 'POST', f'/events/{event_id}/register/', data, token, (201, 202, 400))
+
+
+def op_register_storm(fixture, rng):
+    return op_register(fixture, rng, fixture.storm_event_ids)
+
+
+def op_registered_events(fixture, rng):
+    _, token = rng.choice(fixture.users)
+    return json_request('get_user_registered_events', 'GET', '/user/registered-events/', token=token)
+
+
+def op_admin_events(fixture, rng):
+    return json_request('get_admin_events', 'GET', f'/admin/events/?limit=20&page={rng.randint(1, 2)}', token=fixture.admin_token)
+
+
+def _busy_event(fixture, rng):
+    return rng.choice(fixture.storm_event_ids or fixture.event_ids)
+
+
+def op_participants(fixture, rng):
+    path = f'/events/{_busy_event(fixture, rng)}/participants/?limit=50'
+    return json_request('get_event_participants', 'GET', path, token=fixture.admin_token)
+
+
+def op_export_participants(fixture, rng):
+    file_format = rng.choice(('csv', 'ndjson'))
+    path = f'/events/{_busy_event(fixture, rng)}/participants/export/?as={file_format}'
+    request = json_request('export_event_participants', 'GET', path, token=fixture.admin_token)
+    return request._replace(headers={**request.headers, 'Accept': '*/*'})
+
+
+def op_import_participants(fixture, rng):
+    batch = uuid.uuid4().hex[:8]
+    rows = ['name,email,payment_status'] + [
+        f'Imported {number},import-{fixture.run_id}-{batch}-{number}@{EMAIL_DOMAIN},paid'
+        for number in range(IMPORT_ROWS)
+    ]
+    path = f'/events/{rng.choice(fixture.event_ids)}/participants/import/'
+    headers = {'Content-Type': 'text/csv', 'Authorization': f'Bearer {fixture.admin_token}'}
+    return Request('import_participants', 'POST', path, '\n'.join(rows).encode(), headers, frozenset((200,)))
+
+
+def op_create_event(fixture, rng):
+    data = event_payload(rng, f'{fixture.run_id} extra {uuid.uuid4().hex[:6]}')
+    return json_request('create_event', 'POST', '/events/create/', data, fixture.admin_token, (201,))
+
+
+# Weighted route mixes; `full` touches every route in api/urls.py
+SCENARIOS = {
+    'browse': {
+        op_list_events: 50, op_search_events: 20, op_event_facets: 10, op_event_image: 15, op_user_login: 5,
+    },
+    'registration_storm': {
+        op_register_storm: 70, op_registered_events: 15, op_list_events: 10, op_user_login: 5,
+    },
+    'admin_dashboard': {
+        op_admin_events: 35, op_participants: 30, op_export_participants: 15, op_import_participants: 5,
+        op_create_event: 5, op_admin_login: 5, op_event_facets: 5,
+    },
+    'full': {
+        op_list_events: 20, op_search_events: 10, op_event_facets: 5, op_event_image: 10, op_user_login: 3,
+        op_admin_login: 2, op_user_signup: 2, op_admin_signup: 1, op_register: 10, op_register_storm: 10,
+        op_registered_events: 8, op_admin_events: 6, op_participants: 6, op_export_participants: 3,
+        op_import_participants: 2, op_create_event: 2,
+    },
+}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.rate_limited = 0
+
+    def record(self, elapsed, status, ok):
+        self.latencies.append(elapsed)
+        key = str(status) if isinstance(status, int) else status
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        if status == 429:
+            self.rate_limited += 1
+        elif not ok:
+            self.errors += 1
+
+    def merge(self, other):
+        self.latencies += other.latencies
+        for key, count in other.statuses.items():
+            self.statuses[key] = self.statuses.get(key, 0) + count
+        self.errors += other.errors
+        self.rate_limited += other.rate_limited
+
+    def summary(self, duration):
+        ordered = sorted(self.latencies)
+        count = len(ordered)
+
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+
+        return {
+            'requests': count,
+            'throughput_rps': round(count / duration, 2) if duration else None,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0,
+            'rate_limited': self.rate_limited,
+            'status_codes': dict(sorted(self.statuses.items())),
+            'latency_ms': {
+                'mean': ms(sum(ordered) / count) if count else None,
+                'p50': ms(percentile(ordered, 0.50)),
+                'p95': ms(percentile(ordered, 0.95)),
+                'p99': ms(percentile(ordered, 0.99)),
+                'max': ms(ordered[-1]) if count else None,
+            },
+        }
+
+
+async def _worker(client, fixture, operations, weights, rng, stats, deadline, budget):
+    while time.monotonic() < deadline:
+        if budget is not None:
+            if budget[0] <= 0:
+                return
+            budget[0] -= 1
+        request = rng.choices(operations, weights)[0](fixture, rng)
+        started = time.perf_counter()
+        try:
+            status, _, _ = await client.request(request.method, request.path, request.body, request.headers)
+            ok = status in request.expect
+        except (OSError, HttpError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            client.close()
+            status, ok = type(e).__name__, False
+        stats.setdefault(request.route, RouteStats()).record(time.perf_counter() - started, status, ok)
+
+
+async def run_load(base_url, scenario, concurrency, duration, run_id, requests=None, warmup=0, timeout=30, seed=None,
+                   users=20, events=30, storm_events=3, storm_capacity=25, bypass_token=None, measure_rate_limits=False):
+    """Set up a fixture, warm up, then drive `scenario` with `concurrency` clients; returns the report dict.
+
+    `bypass_token` is sent as X-RateLimit-Bypass during setup, and during the run
+    too unless `measure_rate_limits` is set.
+    """
+    rng = random.Random(seed)
+    bypass = {'X-RateLimit-Bypass': bypass_token} if bypass_token else {}
+    setup_client = HttpClient(base_url, timeout, bypass)
+    try:
+        fixture = await setup_fixture(setup_client, rng, run_id, users, events, storm_events, storm_capacity)
+    finally:
+        setup_client.close()
+
+    mix = SCENARIOS[scenario]
+    operations, weights = list(mix), list(mix.values())
+    run_headers = {} if measure_rate_limits else bypass
+    clients = [HttpClient(base_url, timeout, run_headers) for _ in range(concurrency)]
+    try:
+        if warmup:
+            deadline = time.monotonic() + warmup
+            await asyncio.gather(*(
+                _worker(client, fixture, operations, weights, random.Random(rng.random()), {}, deadline, None)
+                for client in clients
+            ))
+
+        worker_stats = [{} for _ in clients]
+        budget = [requests] if requests else None
+        started_at = datetime.utcnow()
+        started = time.monotonic()
+        # With a request budget the run ends when it is spent; duration still caps it
+        deadline = started + duration
+        await asyncio.gather(*(
+            _worker(client, fixture, operations, weights, random.Random(rng.random()), stats, deadline, budget)
+            for client, stats in zip(clients, worker_stats)
+        ))
+        elapsed = time.monotonic() - started
+    finally:
+        for client in clients:
+            client.close()
+
+    routes = {}
+    total = RouteStats()
+    for stats in worker_stats:
+        for route, route_stats in stats.items():
+            routes.setdefault(route, RouteStats()).merge(route_stats)
+            total.merge(route_stats)
+    return {
+        'scenario': scenario,
+        'base_url': base_url,
+        'run_id': fixture.run_id,
+        'started_at': started_at.isoformat() + 'Z',
+        'duration_s': round(elapsed, 3),
+        'concurrency': concurrency,
+        'warmup_s': warmup,
+        'seed': seed,
+        'rate_limits_bypassed': bool(run_headers),
+        'fixture': {'users': users, 'events': events, 'storm_events': storm_events, 'storm_capacity': storm_capacity},
+        'totals': total.summary(elapsed),
+        'routes': {route: stats.summary(elapsed) for route, stats in sorted(routes.items())},
+    }
+
+
+def teardown_fixture(run_id):
+    """Delete the accounts, events and registrations a run created; returns counts per collection.
+
+    Works on this process's database, so it only cleans up after a server
+    sharing MONGODB_URI. Event images are content-addressed and shared, so the
+    one-pixel fixture image is left in place.
+    """
+    events = get_events_collection()
+    event_ids = [event['_id'] for event in events.find({'title': {'$regex': f'^{re.escape(run_id)} '}}, {'_id': 1})]
+    run_email = {'$regex': f'-{re.escape(run_id)}-[^@]+@{re.escape(EMAIL_DOMAIN)}$'}
+    deleted = {
+        'registrations': get_registrations_collection().delete_many({'$or': [
+            {'event_id': {'$in': [str(event_id) for event_id in event_ids]}},
+            {'user_email': run_email},
+        ]}).deleted_count,
+        'events': events.delete_many({'_id': {'$in': event_ids}}).deleted_count,
+        'users': get_users_collection().delete_many({'email': run_email}).deleted_count,
+        'admins': get_admins_collection().delete_many({'email': run_email}).deleted_count,
+    }
+    return deleted
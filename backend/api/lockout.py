@@ -0,0 +1,61 @@
+# Failed-login accounting for the users collection of the legacy auth views
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from pymongo import ReturnDocument
+
+MAX_LOGIN_ATTEMPTS = 5
+# Locked accounts remembered per process; older entries are evicted first
+LOCKED_ACCOUNT_CACHE_SIZE = 10000
+
+
+class RecentlyLocked:
+    """Emails of accounts known to be locked, so further attempts are refused without a query.
+
+    Entries expire after LOCKED_ACCOUNT_CACHE_TTL seconds, which bounds how long an
+    account unlocked by support (possibly via another process) keeps being refused here.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # email -> locked_at
+        self._lock = threading.Lock()
+
+    def add(self, email):
+        with self._lock:
+            self._entries[email] = time.monotonic()
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, email):
+        with self._lock:
+            locked_at = self._entries.get(email)
+            if locked_at is None:
+                return False
+            if time.monotonic() - locked_at >= settings.LOCKED_ACCOUNT_CACHE_TTL:
+                del self._entries[email]
+                return False
+            return True
+
+
+recently_locked = RecentlyLocked(LOCKED_ACCOUNT_CACHE_SIZE)
+
+
+def record_failed_login(collection, user_id):
+    """Count a failed attempt and lock the account at MAX_LOGIN_ATTEMPTS in one atomic write.
+
+    Returns True if the account is (now) locked.
+    """
+    user = collection.find_one_and_update(
+        {'_id': user_id, 'account_locked': {'$ne': True}},
+        [
+            {'$set': {'login_attempts': {'$add': [{'$ifNull': ['$login_attempts', 0]}, 1]}}},
+            {'$set': {'account_locked': {'$gte': ['$login_attempts', MAX_LOGIN_ATTEMPTS]}}},
+        ],
+        projection={'account_locked': 1},
+        return_document=ReturnDocument.AFTER
+    )
+    # No match means another request locked it first
+    return user is None or user['account_locked']
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from api.events import build_schedule_fields
+from api.mongo import get_events_collection
+
+SCHEDULE_FIELDS = ('start_date', 'start_time', 'end_date', 'end_time')
+
+
+class Command(BaseCommand):
+    help = 'Add start_at/end_at datetimes and display_date to events stored with string dates only'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help='Recompute every event, not only those missing the fields')
+
+    def handle(self, *args, **options):
+        events = get_events_collection()
+        query = {} if options['all'] else {'$or': [
+            {'start_at': {'$exists': False}},
+            {'end_at': {'$exists': False}},
+            {'display_date': {'$exists': False}},
+        ]}
+        updated = 0
+        skipped = 0
+        batch = []
+        try:
+            cursor = events.find(query, {field: 1 for field in SCHEDULE_FIELDS}).batch_size(options['batch_size'])
+            for event in cursor:
+                try:
+                    schedule = build_schedule_fields(*(event.get(field, '') for field in SCHEDULE_FIELDS))
+                except ValueError:
+                    skipped += 1
+                    self.stdout.write(self.style.WARNING(f"Skipping event {event['_id']}: invalid date or time"))
+                    continue
+                batch.append(UpdateOne({'_id': event['_id']}, {'$set': schedule}))
+                if len(batch) >= options['batch_size']:
+                    updated += events.bulk_write(batch, ordered=False).modified_count
+                    batch = []
+            if batch:
+                updated += events.bulk_write(batch, ordered=False).modified_count
+        except PyMongoError as e:
+            raise CommandError(f'Database error: {str(e)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} event(s), skipped {skipped}'))
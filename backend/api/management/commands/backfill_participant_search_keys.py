@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from api.mongo import get_registrations_collection
+from api.registrations import search_key
+
+
+class Command(BaseCommand):
+    help = 'Add the lowercase user_name_key used by participant search to registrations that lack it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        registrations = get_registrations_collection()
+        updated = 0
+        batch = []
+        try:
+            cursor = registrations.find(
+                {'user_name_key': {'$exists': False}},
+                {'user_name': 1}
+            ).batch_size(options['batch_size'])
+            for registration in cursor:
+                batch.append(UpdateOne(
+                    {'_id': registration['_id']},
+                    {'$set': {'user_name_key': search_key(registration.get('user_name') or '')}}
+                ))
+                if len(batch) >= options['batch_size']:
+                    updated += registrations.bulk_write(batch, ordered=False).modified_count
+                    batch = []
+            if batch:
+                updated += registrations.bulk_write(batch, ordered=False).modified_count
+        except PyMongoError as e:
+            raise CommandError(f'Database error: {str(e)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} registration(s)'))
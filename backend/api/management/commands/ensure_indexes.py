@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from api.indexes import INDEXES, ensure_indexes, get_index_drift
+
+
+class Command(BaseCommand):
+    help = 'Create the declared MongoDB indexes and report drift against the live indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('collections', nargs='*', help='Collections to process (default: all declared)')
+        parser.add_argument('--check', action='store_true', help='Only report drift; exit with an error if any is found')
+
+    def handle(self, *args, **options):
+        collections = options['collections'] or list(INDEXES)
+        unknown = [name for name in collections if name not in INDEXES]
+        if unknown:
+            raise CommandError(f"No indexes declared for: {', '.join(unknown)}")
+
+        drifted = False
+        try:
+            for name in collections:
+                drift = get_index_drift(name)
+                if drift['missing'] and not options['check']:
+                    created = ensure_indexes(name, drift['missing'])
+                    self.stdout.write(f"{name}: created {', '.join(created)}")
+                    drift['missing'] = []
+
+                for kind in ('missing', 'changed', 'undeclared'):
+                    for index_name in drift[kind]:
+                        self.stdout.write(self.style.WARNING(f"{name}: {kind} index {index_name}"))
+                # A changed index must be dropped by hand before it can be rebuilt under the same name;
+                # undeclared indexes cost write throughput but never break queries
+                drifted = drifted or bool(drift['missing'] or drift['changed'])
+        except PyMongoError as e:
+            raise CommandError(f'Database error: {str(e)}')
+
+        if drifted:
+            raise CommandError('Declared and live indexes differ')
+        self.stdout.write(self.style.SUCCESS('Indexes up to date'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from api.expiry import expire_events
+
+
+class Command(BaseCommand):
+    help = 'Mark every active event whose end date and time has passed as inactive'
+
+    def handle(self, *args, **options):
+        try:
+            expired = expire_events()
+        except PyMongoError as e:
+            raise CommandError(f'Database error: {str(e)}')
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} event(s)'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from api.image_variants import IMAGE_VARIANTS, Image, generate_variants, variant_filename
+from api.images import IMAGE_BUCKET, get_image_bucket
+from api.mongo import get_database
+
+
+class Command(BaseCommand):
+    help = 'Render missing thumbnail and detail variants for stored event images'
+
+    def handle(self, *args, **options):
+        if Image is None:
+            raise CommandError('Pillow is required to render image variants')
+
+        files = get_database()[f'{IMAGE_BUCKET}.files']
+        bucket = get_image_bucket()
+        generated = 0
+        failed = 0
+        try:
+            originals = files.distinct('filename', {'metadata.variant': {'$exists': False}})
+            existing = set(files.distinct('filename', {'metadata.variant': {'$exists': True}}))
+            for digest in originals:
+                if all(variant_filename(digest, variant) in existing for variant in IMAGE_VARIANTS):
+                    continue
+                content = bucket.open_download_stream_by_name(digest).read()
+                try:
+                    generate_variants(bucket, digest, content)
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'Skipping image {digest}: {str(e)}'))
+                    continue
+                generated += 1
+        except PyMongoError as e:
+            raise CommandError(f'Database error: {str(e)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered variants for {generated} image(s), {failed} failed'))
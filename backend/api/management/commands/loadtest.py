@@ -0,0 +1,137 @@
+import asyncio
+import json
+import secrets
+import threading
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from pymongo.errors import PyMongoError
+
+from api.loadtest import SCENARIOS, HttpError, new_run_id, run_load, teardown_fixture
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def is_local_mongodb_uri(uri):
+    # No URI means pymongo's default, localhost; SRV records always name remote clusters
+    if not uri:
+        return True
+    if uri.startswith('mongodb+srv://'):
+        return False
+    hosts = uri.split('://', 1)[-1].rsplit('@', 1)[-1].split('/', 1)[0].split('?', 1)[0]
+    return all(host.rsplit(':', 1)[0].strip('[]') in LOCAL_HOSTS for host in hosts.split(','))
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the API with a weighted mix of requests at a given concurrency and report throughput, '
+        'p50/p95/p99 latency and error rates per route as JSON. Accounts, events and registrations '
+        'created for the run are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='browse')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000/api',
+                            help='API root of a running server that uses this MONGODB_URI; ignored with --serve')
+        parser.add_argument('--serve', action='store_true',
+                            help='Serve the API from this process (against MONGODB_URI) instead of a running server')
+        parser.add_argument('--force', action='store_true',
+                            help='Allow a MONGODB_URI or --base-url that is not on this machine')
+        parser.add_argument('--keep-data', action='store_true', help='Leave the run\'s accounts and events in place')
+        parser.add_argument('--bypass-token', default=settings.RATE_LIMIT_BYPASS_TOKEN,
+                            help='The server\'s RATE_LIMIT_BYPASS_TOKEN (default: this process\'s setting)')
+        parser.add_argument('--measure-rate-limits', action='store_true',
+                            help='Only bypass rate limits during setup, so the run measures the limiter too')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run (upper bound with --requests)')
+        parser.add_argument('--requests', type=int, help='Stop after this many requests')
+        parser.add_argument('--warmup', type=float, default=3, help='Seconds of unrecorded traffic before the run')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--events', type=int, default=30)
+        parser.add_argument('--storm-events', type=int, default=3)
+        parser.add_argument('--storm-capacity', type=int, default=25)
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['users'] < 1 or options['events'] < 1:
+            raise CommandError('--concurrency, --users and --events must be at least 1')
+
+        # The run writes real accounts and public events; keep it off shared databases
+        if not options['force']:
+            if not is_local_mongodb_uri(settings.MONGODB_URI):
+                raise CommandError('MONGODB_URI is not a local mongod; point it at one or pass --force')
+            if not options['serve'] and urlsplit(options['base_url']).hostname not in LOCAL_HOSTS:
+                raise CommandError('--base-url is not on this machine; pass --force to load-test it anyway')
+
+        server = None
+        base_url = options['base_url']
+        bypass_token = options['bypass_token']
+        if options['serve']:
+            if not bypass_token:
+                bypass_token = settings.RATE_LIMIT_BYPASS_TOKEN = secrets.token_urlsafe(24)
+            server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                                 server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}/api'
+        elif not bypass_token:
+            self.stderr.write(self.style.WARNING(
+                'No rate-limit bypass token: setup will be throttled unless the server has RATE_LIMIT_ENABLED=false'
+            ))
+
+        run_id = new_run_id()
+        try:
+            report = asyncio.run(run_load(
+                base_url,
+                options['scenario'],
+                options['concurrency'],
+                options['duration'],
+                run_id,
+                requests=options['requests'],
+                warmup=options['warmup'],
+                timeout=options['timeout'],
+                seed=options['seed'],
+                users=options['users'],
+                events=options['events'],
+                storm_events=options['storm_events'],
+                storm_capacity=options['storm_capacity'],
+                bypass_token=bypass_token,
+                measure_rate_limits=options['measure_rate_limits'],
+            ))
+        except (OSError, HttpError, asyncio.TimeoutError) as e:
+            raise CommandError(f'Load test setup failed: {str(e)}')
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            if not options['keep_data']:
+                try:
+                    deleted = teardown_fixture(run_id)
+                except PyMongoError as e:
+                    raise CommandError(f'Teardown of run {run_id} failed: {str(e)}')
+                self.stderr.write(f"Removed run {run_id}: " + ', '.join(f'{count} {name}' for name, count in deleted.items()))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            totals = report['totals']
+            self.stdout.write(self.style.SUCCESS(
+                f"{totals['requests']} request(s), {totals['throughput_rps']} req/s, "
+                f"p95 {totals['latency_ms']['p95']} ms, error rate {totals['error_rate']}; report in {options['output']}"
+            ))
+        else:
+            self.stdout.write(output)
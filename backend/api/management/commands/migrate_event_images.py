@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+
+from api.images import InvalidImage, store_data_url
+from api.mongo import get_events_collection
+
+
+class Command(BaseCommand):
+    help = 'Move base64 images embedded in event documents into the GridFS image store'
+
+    def add_arguments(self, parser):
+        # Embedded images are large, so keep cursor batches small
+        parser.add_argument('--batch-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        events = get_events_collection()
+        migrated = 0
+        skipped = 0
+        try:
+            cursor = events.find(
+                {'image': {'$regex': '^data:image'}, 'image_id': {'$exists': False}},
+                {'image': 1}
+            ).batch_size(options['batch_size'])
+            for event in cursor:
+                try:
+                    image_fields = store_data_url(event['image'])
+                except InvalidImage:
+                    skipped += 1
+                    self.stdout.write(self.style.WARNING(f"Skipping event {event['_id']}: invalid image data"))
+                    continue
+                events.update_one({'_id': event['_id']}, {'$set': image_fields, '$unset': {'image': ''}})
+                migrated += 1
+        except PyMongoError as e:
+            raise CommandError(f'Database error: {str(e)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Migrated {migrated} image(s), skipped {skipped}'))
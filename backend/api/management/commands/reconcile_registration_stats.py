@@ -0,0 +1,54 @@
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from api.counters import EMPTY_STATS, stats_pipeline
+from api.mongo import get_events_collection, get_registrations_collection
+
+
+class Command(BaseCommand):
+    help = "Recompute each event's registration_stats and seats_taken from the registrations collection"
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='Events to reconcile (default: all)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            event_oids = [ObjectId(event_id) for event_id in options['event_ids']]
+        except InvalidId as e:
+            raise CommandError(str(e))
+
+        events = get_events_collection()
+        registrations = get_registrations_collection()
+        match = {'event_id': {'$in': options['event_ids']}} if event_oids else None
+        query = {'_id': {'$in': event_oids}} if event_oids else {}
+        updated = 0
+        batch = []
+        try:
+            counted = {
+                stats.pop('_id'): stats
+                for stats in registrations.aggregate(stats_pipeline(match), allowDiskUse=True)
+            }
+            now = datetime.utcnow()
+            cursor = events.find(query, {'registration_stats': 1, 'seats_taken': 1}).batch_size(options['batch_size'])
+            for event in cursor:
+                stats = {**EMPTY_STATS, **counted.get(str(event['_id']), {})}
+                if event.get('registration_stats') == stats and event.get('seats_taken', 0) == stats['total']:
+                    continue
+                batch.append(UpdateOne(
+                    {'_id': event['_id']},
+                    {'$set': {'registration_stats': stats, 'seats_taken': stats['total'], 'stats_updated_at': now}}
+                ))
+                if len(batch) >= options['batch_size']:
+                    updated += events.bulk_write(batch, ordered=False).modified_count
+                    batch = []
+            if batch:
+                updated += events.bulk_write(batch, ordered=False).modified_count
+        except PyMongoError as e:
+            raise CommandError(f'Database error: {str(e)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled registration counters of {updated} event(s)'))
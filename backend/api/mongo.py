@@ -0,0 +1,171 @@
+# Shared MongoDB client and connection pool for the api app
+import os
+import threading
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+from django.conf import settings
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events so pool health can be inspected at runtime"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {
+                'pools_created': 0,
+                'pools_cleared': 0,
+                'connections_created': 0,
+                'connections_closed': 0,
+                'checkouts': 0,
+                'checkout_failures': 0,
+                'checkins': 0,
+            }
+            self.checked_out = 0
+
+    def _bump(self, key, checked_out_delta=0):
+        with self._lock:
+            self.counters[key] += 1
+            self.checked_out += checked_out_delta
+
+    def pool_created(self, event):
+        self._bump('pools_created')
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump('pools_cleared')
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump('connections_created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump('connections_closed')
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._bump('checkout_failures')
+
+    def connection_checked_out(self, event):
+        self._bump('checkouts', 1)
+
+    def connection_checked_in(self, event):
+        self._bump('checkins', -1)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['checked_out'] = self.checked_out
+            stats['open_connections'] = stats['connections_created'] - stats['connections_closed']
+            return stats
+
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+_pool_listener = PoolStatsListener()
+
+
+def get_pool_options():
+    return {
+        'maxPoolSize': settings.MONGODB_MAX_POOL_SIZE,
+        'minPoolSize': settings.MONGODB_MIN_POOL_SIZE,
+        'maxIdleTimeMS': settings.MONGODB_MAX_IDLE_TIME_MS,
+        'waitQueueTimeoutMS': settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        'connectTimeoutMS': settings.MONGODB_CONNECT_TIMEOUT_MS,
+        'socketTimeoutMS': settings.MONGODB_SOCKET_TIMEOUT_MS,
+    }
+
+
+def get_client():
+    """Return the process-wide MongoClient, creating it on first use.
+
+    MongoClient is not fork-safe, so a client inherited from a parent process
+    (e.g. a pre-forking WSGI server) is discarded and a fresh pool is built.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _pool_listener.reset()
+            try:
+                _client = MongoClient(
+                    settings.MONGODB_URI,
+                    retryWrites=True,
+                    retryReads=True,
+                    event_listeners=[_pool_listener],
+                    **get_pool_options()
+                )
+            except PyMongoError as e:
+                raise Exception(f"Database connection error: {str(e)}")
+            _client_pid = pid
+    return _client
+
+
+def close_client():
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def _reset_after_fork():
+    # Drop the parent's client without closing its sockets; the child builds its own pool lazily
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+    _pool_listener._lock = threading.Lock()
+    _pool_listener.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_database():
+    return get_client()[settings.MONGODB_DATABASE]
+
+
+def get_collection(name):
+    return get_database()[name]
+
+
+def get_events_collection():
+    return get_collection('events')
+
+
+def get_registrations_collection():
+    return get_collection('registrations')
+
+
+def get_users_collection():
+    return get_collection('users')
+
+
+def get_admins_collection():
+    return get_collection('admins')
+
+
+def get_pool_stats():
+    stats = _pool_listener.snapshot()
+    stats['connected'] = _client is not None and _client_pid == os.getpid()
+    stats['options'] = get_pool_options()
+    return stats
@@ -0,0 +1,54 @@
+# Keyset (cursor) pagination helpers for Mongo queries
+import base64
+from bson import json_util
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def parse_positive_int(request, name, default, maximum=None):
+    """?<name>= as a positive integer, capped at `maximum`; raises ValueError otherwise"""
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f'{name} must be a positive number')
+    return min(int(value), maximum) if maximum else int(value)
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for the sort-key values of the last document on a page"""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def cursor_for(document, sort):
+    return encode_cursor([document[field] for field, _ in sort])
+
+
+def keyset_filter(sort, token):
+    """Mongo filter matching the documents that come after `token` in `sort` order.
+
+    `sort` is a list of (field, direction) pairs ending in a unique field such
+    as _id, so that the order is total and no document is skipped or repeated.
+    Callers fetch one document more than the page size: its presence tells
+    whether another page exists without counting the matches.
+    """
+    values = decode_cursor(token, len(sort))
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prior: value for (prior, _), value in zip(sort[:i], values[:i])}
+        clause[field] = {'$lt' if direction < 0 else '$gt': values[i]}
+        clauses.append(clause)
+    return {'$or': clauses}
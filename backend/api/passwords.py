@@ -0,0 +1,120 @@
+# Password hashing on a bounded worker pool, with scrypt hashes and rehash-on-login for legacy SHA-256
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+SCRYPT_PREFIX = 'scrypt'
+
+_executor = None
+_executor_pid = None
+_slots = None
+_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """Every hashing slot stayed taken for PASSWORD_HASH_ADMIT_TIMEOUT_MS"""
+
+
+def _get_pool():
+    global _executor, _executor_pid, _slots
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix='password-hash'
+            )
+            # Running plus queued jobs; anything beyond waits briefly for admission, then is refused
+            _slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUED)
+            _executor_pid = os.getpid()
+    return _executor, _slots
+
+
+def _run(func, *args):
+    executor, slots = _get_pool()
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_ADMIT_TIMEOUT_MS / 1000):
+        raise PasswordHashingBusy()
+    try:
+        # hashlib.scrypt releases the GIL, so worker threads hash in parallel
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL needs about 128 * n * r bytes; leave headroom over its 32 MiB default cap
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + (1 << 20), dklen=32)
+
+
+def _encode(password):
+    n, r, p = settings.PASSWORD_SCRYPT_N, settings.PASSWORD_SCRYPT_R, settings.PASSWORD_SCRYPT_P
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, n, r, p)
+    return '$'.join([
+        SCRYPT_PREFIX, str(n), str(r), str(p),
+        base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+    ])
+
+
+def _legacy_hash(password):
+    salt = os.getenv('PASSWORD_SALT', 'default-salt-value')
+    return hashlib.sha256((password + salt).encode()).hexdigest()
+
+
+def _check(password, hashed_password):
+    if not hashed_password.startswith(SCRYPT_PREFIX + '$'):
+        return hmac.compare_digest(_legacy_hash(password), hashed_password)
+    try:
+        _, n, r, p, salt, digest = hashed_password.split('$')
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def hash_password(password):
+    return _run(_encode, password)
+
+
+def verify_password(password, hashed_password):
+    if not hashed_password:
+        return False
+    return _run(_check, password, hashed_password)
+
+
+def needs_rehash(hashed_password):
+    """True for legacy SHA-256 hashes and scrypt hashes made with another work factor"""
+    current = [SCRYPT_PREFIX, str(settings.PASSWORD_SCRYPT_N), str(settings.PASSWORD_SCRYPT_R), str(settings.PASSWORD_SCRYPT_P)]
+    return hashed_password.split('$')[:4] != current
+
+
+def upgrade_password_hash(collection, document, password):
+    """After a successful login, re-hash the password if it was stored with an outdated scheme"""
+    if not needs_rehash(document['password']):
+        return
+    try:
+        new_hash = hash_password(password)
+    except PasswordHashingBusy:
+        return  # Try again on a later login rather than delaying this one
+    # Only replace the hash we verified, in case the password changed meanwhile
+    collection.update_one(
+        {'_id': document['_id'], 'password': document['password']},
+        {'$set': {'password': new_hash, 'updated_at': datetime.utcnow()}}
+    )
+
+
+def hashing_busy_response():
+    response = Response(
+        {'error': 'Server is busy, please try again shortly'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(settings.PASSWORD_HASH_RETRY_AFTER)
+    return response
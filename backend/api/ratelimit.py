@@ -0,0 +1,141 @@
+# Token-bucket rate limiting per route, keyed by client IP or JWT subject, applied before views run
+import hmac
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework import status
+
+from .authentication import decode_token
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+def parse_rate(rate):
+    """'10/m' -> (capacity 10, refill 10/60 tokens per second)"""
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+def _take(state, capacity, refill, now):
+    # Returns (new state, seconds until a token is available; 0 if one was taken)
+    tokens, updated_at = state if state else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated_at) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / refill
+
+
+class MemoryRateLimitStore:
+    """Buckets in this process only; the least recently used are dropped beyond `maxsize`"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill, now):
+        with self._lock:
+            state, wait = _take(self._buckets.get(key), capacity, refill, now)
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class CacheRateLimitStore:
+    """Buckets in a Django cache, shared by every process using the same backend.
+
+    Read-modify-write without a lock, so simultaneous requests from one client
+    may occasionally both get the last token.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, refill, now):
+        state, wait = _take(self.cache.get(key), capacity, refill, now)
+        # Kept until the bucket would be full again anyway
+        self.cache.set(key, state, timeout=math.ceil(capacity / refill) + 1)
+        return wait
+
+
+def get_store():
+    if settings.RATE_LIMIT_STORE == 'cache':
+        return CacheRateLimitStore(settings.RATE_LIMIT_CACHE_ALIAS)
+    return MemoryRateLimitStore()
+
+
+def client_ip(request):
+    # Behind N trusted proxies the client is the Nth address from the right of X-Forwarded-For
+    proxies = settings.RATE_LIMIT_PROXY_COUNT
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def is_bypassed(request):
+    # Trusted tooling (e.g. the loadtest command) may skip the limits with the configured token
+    token = settings.RATE_LIMIT_BYPASS_TOKEN
+    supplied = request.headers.get('X-RateLimit-Bypass')
+    return bool(token and supplied) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def token_subject(request):
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    try:
+        claims = decode_token(auth_header.split(' ')[1])
+    except Exception:
+        return None
+    subject = claims.get('admin_id') or claims.get('user_id')
+    return f"{claims.get('user_type')}:{subject}" if subject else None
+
+
+class RateLimitMiddleware:
+    """Apply settings.RATE_LIMITS: {url name: [(scope, rate), ...]} with scope 'ip' or 'user'.
+
+    'user' rules use the bearer token's subject and are skipped for anonymous
+    requests. A request is refused with 429 as soon as one of its buckets is empty.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.store = get_store()
+        self.rules = {
+            name: [(scope, *parse_rate(rate)) for scope, rate in rules]
+            for name, rules in settings.RATE_LIMITS.items()
+        }
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATE_LIMIT_ENABLED or request.method == 'OPTIONS':
+            return None
+        route = request.resolver_match.url_name if request.resolver_match else None
+        rules = self.rules.get(route)
+        if not rules or is_bypassed(request):
+            return None
+
+        now = time.time()
+        for scope, capacity, refill in rules:
+            identity = client_ip(request) if scope == 'ip' else token_subject(request)
+            if not identity:
+                continue
+            wait = self.store.take(f'ratelimit:{route}:{scope}:{identity}', capacity, refill, now)
+            if wait:
+                response = JsonResponse(
+                    {'error': 'Too many requests. Please try again later.'},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
+                )
+                response['Retry-After'] = str(math.ceil(wait))
+                return response
+        return None
@@ -1,40 +1,200 @@
 import json
-import jwt
 import os
-from datetime import datetime
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+import re
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from bson import ObjectId
+from bson.errors import InvalidId
 from dotenv import load_dotenv
 
+from .authentication import auth_error, authenticate_request, get_token_claims
+from .counters import counter_update
+from .conditional import is_not_modified, latest_change, make_etag, not_modified_response, set_validators
+from .fields import FieldSet
+from .images import image_url
+from .mongo import get_events_collection, get_registrations_collection
+from .pagination import cursor_for, decode_cursor, keyset_filter, parse_positive_int
+from .streaming import streaming_csv_response, streaming_json_response, streaming_ndjson_response, wants_stream
+
 load_dotenv()
 
-# Constants
-MONGODB_URI = os.getenv('MONGODB_URI')
-MONGODB_DATABASE = os.getenv('MONGODB_DATABASE')
-SECRET_KEY = os.getenv('SECRET_KEY')
+# Registration status; waitlisted registrations hold no seat
+CONFIRMED = 'confirmed'
+WAITLISTED = 'waitlisted'
+
+# Largest page of get_event_participants
+MAX_PARTICIPANTS_LIMIT = 200
+# Largest page of get_user_registered_events
+MAX_REGISTERED_EVENTS_LIMIT = 50
+
+# Participant listings, newest first
+PARTICIPANTS_SORT = [('registration_date', -1), ('_id', -1)]
+
+# Event fields copied onto a registration, and its seat counters
+SEAT_PROJECTION = {'title': 1, 'type': 1, 'cost': 1, 'capacity': 1, 'seats_taken': 1}
+
+# Fields selectable with ?fields= on get_event_participants
+PARTICIPANT_FIELDS = FieldSet({
+    'id': ((), lambda participant, request: str(participant['_id'])),
+    'user_name': (('user_name',), lambda participant, request: participant['user_name']),
+    'user_email': (('user_email',), lambda participant, request: participant['user_email']),
+    'phone_number': (('phone_number',), lambda participant, request: participant.get('phone_number', '')),
+    'registration_date': (('registration_date',), lambda participant, request: participant['registration_date'].strftime('%Y-%m-%d %H:%M:%S')),
+    'payment_status': (('payment_status',), lambda participant, request: participant['payment_status']),
+    'payment_method': (('payment_method',), lambda participant, request: participant.get('payment_method', 'none')),
+    'status': (('status',), lambda participant, request: participant.get('status', CONFIRMED)),
+}, default=('id', 'user_name', 'user_email', 'phone_number', 'registration_date', 'payment_status', 'payment_method', 'status'))
+
+# Download formats of export_event_participants, in order of preference for Accept: */*
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Fields selectable with ?fields= on get_user_registered_events; documents are
+# registrations with the joined event under 'event'
+REGISTERED_EVENT_FIELDS = FieldSet({
+    'id': (('event._id',), lambda registration, request: str(registration['event']['_id'])),
+    'title': (('event.title',), lambda registration, request: registration['event']['title']),
+    'venue': (('event.venue',), lambda registration, request: registration['event']['venue']),
+    'start_date': (('event.start_date',), lambda registration, request: registration['event']['start_date']),
+    'start_time': (('event.start_time',), lambda registration, request: registration['event']['start_time']),
+    'end_date': (('event.end_date',), lambda registration, request: registration['event']['end_date']),
+    'end_time': (('event.end_time',), lambda registration, request: registration['event']['end_time']),
+    'cost': (('event.cost',), lambda registration, request: registration['event']['cost']),
+    'type': (('event.type',), lambda registration, request: registration['event']['type']),
+    'category': (('event.category',), lambda registration, request: registration['event'].get('category', 'other')),
+    'image': (('event._id', 'event.image_id', 'event.image_url'), lambda registration, request: image_url(request, registration['event'])),
+    'description': (('event.description',), lambda registration, request: registration['event']['description']),
+    'date': (('event.display_date',), lambda registration, request: registration['event'].get('display_date', '')),
+    'registration_date': (('registration_date',), lambda registration, request: registration['registration_date'].strftime('%Y-%m-%d %H:%M:%S')),
+    'payment_status': (('payment_status',), lambda registration, request: registration['payment_status']),
+    'registration_status': (('status',), lambda registration, request: registration.get('status', CONFIRMED)),
+}, default=(
+    'id', 'title', 'venue', 'start_date', 'start_time', 'end_date', 'end_time', 'cost', 'type',
+    'category', 'image', 'description', 'registration_date', 'payment_status', 'registration_status'
+))
 
-def get_events_collection():
+def registered_event_lookup(fields):
+    """Stages joining each registration to its event, with only the requested event fields.
+
+    The event is left out when it has been deleted (see render_registered_event).
+    """
+    event_fields = {'_id': 1}
+    registration_fields = {'event_id': 1, 'event': 1}
+    for source in REGISTERED_EVENT_FIELDS.projection(fields):
+        if source.startswith('event.'):
+            event_fields[source[len('event.'):]] = 1
+        else:
+            registration_fields[source] = 1
+    return [
+        {'$lookup': {
+            'from': 'events',
+            'let': {'event_oid': {'$convert': {'input': '$event_id', 'to': 'objectId', 'onError': None, 'onNull': None}}},
+            'pipeline': [
+                {'$match': {'$expr': {'$eq': ['$_id', '$$event_oid']}}},
+                {'$project': event_fields},
+            ],
+            'as': 'event',
+        }},
+        {'$unwind': {'path': '$event', 'preserveNullAndEmptyArrays': True}},
+        {'$project': registration_fields},
+    ]
+
+def render_registered_event(registration, fields, request):
+    if 'event' in registration:
+        return REGISTERED_EVENT_FIELDS.render(registration, fields, request)
+    # The event was deleted: keep the registration's own fields and flag the rest as missing
+    rendered = {'id': registration.get('event_id'), 'missing': True}
+    for name in fields:
+        sources = REGISTERED_EVENT_FIELDS.fields[name][0]
+        if sources and not any(source.startswith('event.') for source in sources):
+            rendered[name] = REGISTERED_EVENT_FIELDS.fields[name][1](registration, request)
+    return rendered
+
+def search_key(value):
+    # Lowercased copy of a name, stored so prefix searches can use an index
+    return value.strip().lower()
+
+def _parse_registration_date(value, end=False):
+    # Dates without a time cover the whole day, so an end date is inclusive
     try:
-        client = MongoClient(MONGODB_URI)
-        db = client[MONGODB_DATABASE]
-        return client, db.events
-    except PyMongoError as e:
-        raise Exception(f"Database connection error: {str(e)}")
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def participant_query(request, event_id):
+    """Mongo filter for an event's participants from ?payment_status=, ?registered_from=,
+    ?registered_to= and ?search= (prefix of the name or email). Raises ValueError.
+    """
+    query = {'event_id': event_id}
+    payment_status = request.GET.get('payment_status')
+    if payment_status:
+        query['payment_status'] = payment_status
+    registered_from = request.GET.get('registered_from')
+    registered_to = request.GET.get('registered_to')
+    if registered_from or registered_to:
+        query['registration_date'] = {}
+        if registered_from:
+            query['registration_date']['$gte'] = _parse_registration_date(registered_from)
+        if registered_to:
+            query['registration_date']['$lt'] = _parse_registration_date(registered_to, end=True)
+    search = search_key(request.GET.get('search', ''))
+    if search:
+        # Anchored, case-sensitive regexes on lowercase keys are index range scans
+        prefix = {'$regex': '^' + re.escape(search)}
+        query['$or'] = [{'user_name_key': prefix}, {'user_email': prefix}]
+    return query
 
-def get_registrations_collection():
+def claim_seat(events, event_oid, payment_status):
+    """Take one seat of an active event and count the registration in one atomic update.
+
+    Returns the event (after the update), or None if it does not exist or is
+    full. Events without a capacity never fill up; their counter still counts.
+    """
+    return events.find_one_and_update(
+        {
+            '_id': event_oid,
+            'status': 'active',
+            '$or': [
+                {'capacity': None},
+                {'$expr': {'$lt': [{'$ifNull': ['$seats_taken', 0]}, '$capacity']}}
+            ]
+        },
+        counter_update(payment_status, seats=1),
+        projection=SEAT_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+
+def registration_event_fields(event):
+    """Event fields copied onto a registration"""
+    return {'event_title': event['title'], 'event_type': event['type'], 'event_cost': event['cost']}
+
+def discard_registration(registrations, events, registration_id, event_oid, payment_status, claimed):
+    """Best-effort undo of a registration that failed part way, including its seat if one was claimed"""
     try:
-        client = MongoClient(MONGODB_URI)
-        db = client[MONGODB_DATABASE]
-        return client, db.registrations
+        registrations.delete_one({'_id': registration_id})
+        if claimed is not None:
+            events.update_one({'_id': event_oid}, counter_update(payment_status, sign=-1, seats=-1))
     except PyMongoError as e:
-        raise Exception(f"Database connection error: {str(e)}")
+        print(f"Discarding registration {registration_id} failed: {str(e)}")
+
+def seats_left(event):
+    if event.get('capacity') is None:
+        return None
+    return max(event['capacity'] - event.get('seats_taken', 0), 0)
 
 @csrf_exempt
 @api_view(['POST'])
@@ -42,19 +202,11 @@ def get_registrations_collection():
 def register_for_event(request, event_id):
     try:
         # Verify user token (for user authentication)
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'user':
-                return Response({'error': 'Only users can register for events'}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.ExpiredSignatureError:
-            return Response({'error': 'Token expired'}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
+        payload = get_token_claims(request)
+        if payload is None:
+            return Response({'error': auth_error(request)}, status=status.HTTP_401_UNAUTHORIZED)
+        if payload.get('user_type') != 'user':
+            return Response({'error': 'Only users can register for events'}, status=status.HTTP_401_UNAUTHORIZED)
 
         data = json.loads(request.body)
         payment_status = data.get('payment_status', 'pending')
@@ -62,54 +214,72 @@ def register_for_event(request, event_id):
         phone_number = data.get('phone_number', '')
 
         try:
-            # Check if event exists and get event details
-            client, events = get_events_collection()
-            event = events.find_one({'_id': ObjectId(event_id)})
-            if not event:
-                return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
-
-            # Check if user already registered
-            registrations_client, registrations = get_registrations_collection()
-            existing_registration = registrations.find_one({
-                'event_id': event_id,
-                'user_id': payload['user_id']
-            })
-            
-            if existing_registration:
+            event_oid = ObjectId(event_id)
+        except InvalidId:
+            return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            events = get_events_collection()
+            registrations = get_registrations_collection()
+
+            # The unique (event_id, user_id) index rejects repeat registrations. The
+            # registration goes in waitlisted, holding no seat, so a repeat submission
+            # never takes a seat; it is confirmed once a seat has been claimed.
+            try:
+                result = registrations.insert_one({
+                    'event_id': event_id,
+                    'user_id': payload['user_id'],
+                    'user_name': payload['name'],
+                    'user_name_key': search_key(payload['name']),
+                    'user_email': payload['email'],
+                    'phone_number': phone_number,
+                    'payment_status': payment_status,
+                    'payment_method': payment_method,
+                    'registration_date': datetime.utcnow(),
+                    'status': WAITLISTED
+                })
+            except DuplicateKeyError:
                 return Response({'error': 'Already registered for this event'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Create registration record
-            registration_data = {
-                'event_id': event_id,
-                'event_title': event['title'],
-                'user_id': payload['user_id'],
-                'user_name': payload['name'],
-                'user_email': payload['email'],
-                'phone_number': phone_number,
-                'payment_status': payment_status,
-                'payment_method': payment_method,
-                'registration_date': datetime.utcnow(),
-                'event_type': event['type'],
-                'event_cost': event['cost']
-            }
+            claimed = None
+            try:
+                claimed = claim_seat(events, event_oid, payment_status)
+                if claimed is None:
+                    # Every seat is taken, or there is no such active event
+                    event = events.find_one({'_id': event_oid, 'status': 'active'}, SEAT_PROJECTION)
+                    if event is None:
+                        registrations.delete_one({'_id': result.inserted_id})
+                        return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+                    registrations.update_one({'_id': result.inserted_id}, {'$set': registration_event_fields(event)})
+                    events.update_one({'_id': event_oid}, counter_update(payment_status, waitlisted=True))
+                    return Response({
+                        'message': 'Event is full; you have been added to the waitlist',
+                        'registration_id': str(result.inserted_id),
+                        'event_title': event['title'],
+                        'status': WAITLISTED,
+                        'payment_required': False
+                    }, status=status.HTTP_202_ACCEPTED)
 
-            result = registrations.insert_one(registration_data)
-            registration_data['_id'] = result.inserted_id
+                registrations.update_one(
+                    {'_id': result.inserted_id},
+                    {'$set': {'status': CONFIRMED, **registration_event_fields(claimed)}}
+                )
+            except Exception:
+                # Leave neither a half-made registration nor its seat behind
+                discard_registration(registrations, events, result.inserted_id, event_oid, payment_status, claimed)
+                raise
 
             return Response({
                 'message': 'Successfully registered for event',
                 'registration_id': str(result.inserted_id),
-                'event_title': event['title'],
-                'payment_required': event['type'] == 'PAID'
+                'event_title': claimed['title'],
+                'status': CONFIRMED,
+                'seats_left': seats_left(claimed),
+                'payment_required': claimed['type'] == 'PAID'
             }, status=status.HTTP_201_CREATED)
 
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
-            if 'registrations_client' in locals():
-                registrations_client.close()
 
     except json.JSONDecodeError:
         return Response({'error': 'Invalid JSON data'}, status=status.HTTP_400_BAD_REQUEST)
@@ -122,48 +292,67 @@ def register_for_event(request, event_id):
 def get_event_participants(request, event_id):
     try:
         # Verify admin token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        token = auth_header.split(' ')[1]
+        payload = get_token_claims(request)
+        if payload is None:
+            return Response({'error': auth_error(request)}, status=status.HTTP_401_UNAUTHORIZED)
+        if payload.get('user_type') != 'admin':
+            return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # `after` holds the next_cursor of the previous page
+        after = request.GET.get('after')
+
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'admin':
-                return Response({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.ExpiredSignatureError:
-            return Response({'error': 'Token expired'}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
+            # Pagination is optional; without a limit or cursor every match is returned
+            limit = parse_positive_int(request, 'limit', None, MAX_PARTICIPANTS_LIMIT)
+            fields = PARTICIPANT_FIELDS.parse(request)
+            query = participant_query(request, event_id)
+            if after:
+                decode_cursor(after, len(PARTICIPANTS_SORT))
+        except ValueError as e:  # InvalidFields, InvalidCursor, a bad limit or filter
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            client, registrations = get_registrations_collection()
-            participants = list(registrations.find({
-                'event_id': event_id
-            }).sort('registration_date', -1))
-
-            participants_list = []
-            for participant in participants:
-                participants_list.append({
-                    'id': str(participant['_id']),
-                    'user_name': participant['user_name'],
-                    'user_email': participant['user_email'],
-                    'phone_number': participant.get('phone_number', ''),
-                    'registration_date': participant['registration_date'].strftime('%Y-%m-%d %H:%M:%S'),
-                    'payment_status': participant['payment_status'],
-                    'payment_method': participant.get('payment_method', 'none')
-                })
+            registrations = get_registrations_collection()
+            participants_cursor = registrations.find(
+                {'$and': [query, keyset_filter(PARTICIPANTS_SORT, after)]} if after else query,
+                PARTICIPANT_FIELDS.projection(fields, extra=('registration_date',))
+            ).sort(PARTICIPANTS_SORT)
 
-            return Response({
-                'participants': participants_list,
-                'total_count': len(participants_list)
-            }, status=status.HTTP_200_OK)
+            if wants_stream(request):
+                participants_cursor = participants_cursor.batch_size(settings.STREAM_BATCH_SIZE)
+                return streaming_json_response(
+                    'participants',
+                    (PARTICIPANT_FIELDS.render(participant, fields, request) for participant in participants_cursor),
+                    count_key='total_count'
+                )
+
+            if limit is None and after is None:
+                participants_list = [PARTICIPANT_FIELDS.render(participant, fields, request) for participant in participants_cursor]
+                return Response({
+                    'participants': participants_list,
+                    'total_count': len(participants_list)
+                }, status=status.HTTP_200_OK)
+
+            limit = limit or 50
+            page_participants = list(participants_cursor.limit(limit + 1))
+            has_more = len(page_participants) > limit
+            page_participants = page_participants[:limit]
+
+            response_data = {
+                'participants': [PARTICIPANT_FIELDS.render(participant, fields, request) for participant in page_participants],
+                'pagination': {
+                    'limit': limit,
+                    'has_more': has_more,
+                    'next_cursor': cursor_for(page_participants[-1], PARTICIPANTS_SORT) if has_more else None
+                }
+            }
+            # Counting is the expensive part, so it is done for the first page only unless asked
+            if after is None or request.GET.get('include_total', '').lower() in ('1', 'true'):
+                response_data['total_count'] = registrations.count_documents(query)
+            return Response(response_data, status=status.HTTP_200_OK)
 
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
 
     except Exception as e:
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -174,61 +363,124 @@ def get_event_participants(request, event_id):
 def get_user_registered_events(request):
     try:
         # Verify user token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        token = auth_header.split(' ')[1]
+        payload = get_token_claims(request)
+        if payload is None:
+            return Response({'error': auth_error(request)}, status=status.HTTP_401_UNAUTHORIZED)
+        if payload.get('user_type') != 'user':
+            return Response({'error': 'Only users can access this endpoint'}, status=status.HTTP_401_UNAUTHORIZED)
+
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            if payload.get('user_type') != 'user':
-                return Response({'error': 'Only users can access this endpoint'}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.ExpiredSignatureError:
-            return Response({'error': 'Token expired'}, status=status.HTTP_401_UNAUTHORIZED)
-        except jwt.InvalidTokenError:
-            return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
+            # Pagination is optional; without a limit every registration is returned
+            page = parse_positive_int(request, 'page', 1)
+            limit = parse_positive_int(request, 'limit', None, MAX_REGISTERED_EVENTS_LIMIT)
+            fields = REGISTERED_EVENT_FIELDS.parse(request)
+        except ValueError as e:  # InvalidFields or a bad page or limit
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            client, registrations = get_registrations_collection()
-            user_registrations = list(registrations.find({
-                'user_id': payload['user_id']
-            }).sort('registration_date', -1))
-
-            events_list = []
-            for registration in user_registrations:
-                # Get event details
-                events_client, events = get_events_collection()
-                event = events.find_one({'_id': ObjectId(registration['event_id'])})
-                events_client.close()
-                
-                if event:
-                    events_list.append({
-                        'id': str(event['_id']),
-                        'title': event['title'],
-                        'venue': event['venue'],
-                        'start_date': event['start_date'],
-                        'start_time': event['start_time'],
-                        'end_date': event['end_date'],
-                        'end_time': event['end_time'],
-                        'cost': event['cost'],
-                        'type': event['type'],
-                        'category': event.get('category', 'other'),
-                        'image': event.get('image', ''),
-                        'description': event['description'],
-                        'registration_date': registration['registration_date'].strftime('%Y-%m-%d %H:%M:%S'),
-                        'payment_status': registration['payment_status']
-                    })
+            registrations = get_registrations_collection()
+            # New registrations move the first validator, event edits and expiry the second
+            last_registration = latest_change(registrations, {'user_id': payload['user_id']}, 'registration_date')
+            last_event_change = latest_change(get_events_collection(), {})
+            last_modified = max(filter(None, [last_registration, last_event_change]), default=None)
+            etag = make_etag('registered_events', payload['user_id'], last_registration, last_event_change, request.get_host(), sorted(request.GET.lists()))
+            if is_not_modified(request, etag, last_modified):
+                return not_modified_response(etag, last_modified, private=True)
 
-            return Response({
+            # One page of registrations first, then only their events are joined, so the cost
+            # does not grow with the number of events a user has joined
+            pipeline = [
+                {'$match': {'user_id': payload['user_id']}},
+                {'$sort': {'registration_date': -1}},
+            ]
+            if limit:
+                pipeline += [{'$skip': (page - 1) * limit}, {'$limit': limit + 1}]
+            pipeline += registered_event_lookup(fields)
+            user_registrations = list(registrations.aggregate(pipeline))
+            if limit:
+                total_count = registrations.count_documents({'user_id': payload['user_id']})
+            else:
+                total_count = len(user_registrations)
+
+            has_more = bool(limit) and len(user_registrations) > limit
+            if has_more:
+                user_registrations = user_registrations[:limit]
+
+            events_list = [render_registered_event(registration, fields, request) for registration in user_registrations]
+
+            response_data = {
                 'events': events_list,
-                'total_count': len(events_list)
-            }, status=status.HTTP_200_OK)
+                'total_count': total_count
+            }
+            if limit:
+                response_data['pagination'] = {
+                    'page': page,
+                    'limit': limit,
+                    'has_more': has_more
+                }
+            return set_validators(Response(response_data, status=status.HTTP_200_OK), etag, last_modified, private=True)
 
         except PyMongoError as e:
             return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if 'client' in locals():
-                client.close()
 
     except Exception as e:
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def export_format(request):
+    # ?as= wins (DRF reserves ?format=); otherwise the first format the Accept header allows
+    requested = request.GET.get('as')
+    if requested:
+        return requested.lower() if requested.lower() in EXPORT_FORMATS else None
+    for name, media_type in EXPORT_FORMATS.items():
+        if request.accepts(media_type):
+            return name
+    return None
+
+# Plain Django view: DRF content negotiation would reject Accept: text/csv
+@require_GET
+def export_event_participants(request, event_id):
+    try:
+        payload = authenticate_request(request)
+        if payload is None:
+            return JsonResponse({'error': auth_error(request)}, status=status.HTTP_401_UNAUTHORIZED)
+        if payload.get('user_type') != 'admin':
+            return JsonResponse({'error': 'Unauthorized. Admin access required.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            event_oid = ObjectId(event_id)
+        except InvalidId:
+            return JsonResponse({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        file_format = export_format(request)
+        if file_format is None:
+            return JsonResponse(
+                {'error': f"Unsupported export format; use ?as= with one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_406_NOT_ACCEPTABLE
+            )
+        try:
+            fields = PARTICIPANT_FIELDS.parse(request)
+            query = participant_query(request, event_id)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if not get_events_collection().find_one({'_id': event_oid}, {'_id': 1}):
+                return JsonResponse({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            registrations = get_registrations_collection()
+            participants_cursor = registrations.find(
+                query,
+                PARTICIPANT_FIELDS.projection(fields)
+            ).sort(PARTICIPANTS_SORT).batch_size(settings.STREAM_BATCH_SIZE)
+            rendered = (PARTICIPANT_FIELDS.render(participant, fields, request) for participant in participants_cursor)
+
+            filename = f'participants-{event_oid}.{file_format}'
+            if file_format == 'ndjson':
+                return streaming_ndjson_response(rendered, filename)
+            return streaming_csv_response(fields, (row.values() for row in rendered), filename)
+
+        except PyMongoError as e:
+            return JsonResponse({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    except Exception as e:
+        return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
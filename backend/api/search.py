@@ -0,0 +1,208 @@
+# Event search (keywords via the events text index, combinable filters, cursor pagination) and catalogue facets
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from pymongo.errors import PyMongoError
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework import status
+
+from .cache import VersionedCache
+from .catalog import get_catalog_version
+from .conditional import is_not_modified, make_etag, not_modified_response, set_validators
+from .events import EVENT_FIELDS, EVENTS_SORT
+from .expiry import not_ended_filter
+from .mongo import get_events_collection
+from .pagination import cursor_for, decode_cursor, keyset_filter, parse_positive_int
+
+# Keyword results, best match first
+RELEVANCE_SORT = [('score', -1), ('_id', -1)]
+EVENT_TYPES = ('FREE', 'PAID')
+MAX_LIMIT = 50
+
+# Search result pages
+EVENT_SEARCH_CACHE = VersionedCache(
+    maxsize=settings.EVENT_LIST_CACHE_SIZE,
+    ttl=settings.EVENT_LIST_CACHE_TTL,
+    stale_ttl=settings.EVENT_LIST_CACHE_STALE_TTL,
+    version_func=get_catalog_version,
+)
+
+# Facet counts, one entry per day; a few entries suffice
+EVENT_FACETS_CACHE = VersionedCache(
+    maxsize=4,
+    ttl=settings.EVENT_LIST_CACHE_TTL,
+    stale_ttl=settings.EVENT_LIST_CACHE_STALE_TTL,
+    version_func=get_catalog_version,
+)
+
+
+def _parse_date(value, end=False):
+    try:
+        parsed = datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}. Use YYYY-MM-DD')
+    # The end date is inclusive
+    return parsed + timedelta(days=1) if end else parsed
+
+
+def search_filter(request):
+    """Filter of listed events matching ?category=, ?type= and ?from=/?to= (start date). Raises ValueError."""
+    query = {'status': 'active', **not_ended_filter()}
+    category = request.GET.get('category', '').strip()
+    if category:
+        query['category'] = category
+    event_type = request.GET.get('type', '').strip().upper()
+    if event_type:
+        if event_type not in EVENT_TYPES:
+            raise ValueError('Event type must be FREE or PAID.')
+        query['type'] = event_type
+    start_from = request.GET.get('from')
+    start_to = request.GET.get('to')
+    if start_from or start_to:
+        query['start_at'] = {}
+        if start_from:
+            query['start_at']['$gte'] = _parse_date(start_from)
+        if start_to:
+            query['start_at']['$lt'] = _parse_date(start_to, end=True)
+    return query
+
+
+def _search_page(request, keywords, limit, after, fields):
+    # Rebuilt here rather than passed in so background cache refreshes use the current time
+    query = search_filter(request)
+    events = get_events_collection()
+    projection = EVENT_FIELDS.projection(fields)
+    if keywords:
+        sort = RELEVANCE_SORT
+        # $text must open the pipeline; the score is kept so later pages can resume from it
+        pipeline = [
+            {'$match': {'$text': {'$search': keywords}, **query}},
+            {'$addFields': {'score': {'$meta': 'textScore'}}},
+            {'$project': {**projection, 'score': 1}},
+        ]
+        if after:
+            pipeline.append({'$match': keyset_filter(sort, after)})
+        pipeline += [{'$sort': dict(sort)}, {'$limit': limit + 1}]
+        page_events = list(events.aggregate(pipeline))
+    else:
+        sort = EVENTS_SORT
+        if after:
+            query = {'$and': [query, keyset_filter(sort, after)]}
+        page_events = list(events.find(query, {**projection, 'created_at': 1}).sort(sort).limit(limit + 1))
+
+    has_more = len(page_events) > limit
+    page_events = page_events[:limit]
+    return {
+        'events': [EVENT_FIELDS.render(event, fields, request) for event in page_events],
+        'pagination': {
+            'limit': limit,
+            'has_more': has_more,
+            'next_cursor': cursor_for(page_events[-1], sort) if has_more else None
+        }
+    }
+
+
+@csrf_exempt
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_events(request):
+    try:
+        keywords = request.GET.get('q', '').strip()
+        # `after` holds the next_cursor of the previous page; cursors of keyword and
+        # filter-only searches are not interchangeable
+        after = request.GET.get('after')
+
+        try:
+            limit = parse_positive_int(request, 'limit', 9, MAX_LIMIT)
+            fields = EVENT_FIELDS.parse(request)
+            search_filter(request)
+            if after:
+                decode_cursor(after, len(RELEVANCE_SORT if keywords else EVENTS_SORT))
+        except ValueError as e:  # InvalidFields, InvalidCursor or a bad filter
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            cache_key = (request.get_host(), tuple((name, tuple(values)) for name, values in sorted(request.GET.lists())))
+            data, outcome = EVENT_SEARCH_CACHE.get_or_compute(
+                cache_key,
+                lambda: _search_page(request, keywords, limit, after, fields)
+            )
+            response = Response(data, status=status.HTTP_200_OK)
+            response['X-Cache'] = outcome
+            return response
+
+        except PyMongoError as e:
+            return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    except Exception as e:
+        return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _date_bucket(now):
+    # Events are bucketed by start; ones already under way count as today
+    end_of_today = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    return {'$switch': {
+        'branches': [
+            {'case': {'$lte': ['$start_at', None]}, 'then': 'unscheduled'},  # missing or null sorts below any date
+            {'case': {'$lt': ['$start_at', end_of_today]}, 'then': 'today'},
+            {'case': {'$lt': ['$start_at', now + timedelta(days=7)]}, 'then': 'this_week'},
+            {'case': {'$lt': ['$start_at', now + timedelta(days=30)]}, 'then': 'this_month'},
+        ],
+        'default': 'later'
+    }}
+
+
+def _count_by(expression):
+    return [
+        {'$group': {'_id': expression, 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1, '_id': 1}},
+    ]
+
+
+def compute_facets():
+    """Counts of listed events by category, type and start-date bucket in one $facet aggregation"""
+    now = datetime.utcnow()
+    pipeline = [
+        {'$match': {'status': 'active', **not_ended_filter(now)}},
+        {'$project': {'category': 1, 'type': 1, 'start_at': 1}},
+        {'$facet': {
+            'total': [{'$count': 'count'}],
+            'category': _count_by({'$ifNull': ['$category', 'other']}),
+            'type': _count_by('$type'),
+            'date': _count_by(_date_bucket(now)),
+        }},
+    ]
+    result = next(get_events_collection().aggregate(pipeline), {})
+    total = result.get('total')
+    return {
+        'total': total[0]['count'] if total else 0,
+        **{
+            facet: [{'value': bucket['_id'], 'count': bucket['count']} for bucket in result.get(facet, [])]
+            for facet in ('category', 'type', 'date')
+        }
+    }
+
+
+@csrf_exempt
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_event_facets(request):
+    try:
+        try:
+            # Date buckets shift at midnight, so each day gets its own entry
+            facets, outcome = EVENT_FACETS_CACHE.get_or_compute(datetime.utcnow().date(), compute_facets)
+        except PyMongoError as e:
+            return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        etag = make_etag('event_facets', facets)
+        if is_not_modified(request, etag):
+            response = not_modified_response(etag)
+        else:
+            response = set_validators(Response(facets, status=status.HTTP_200_OK), etag)
+        response['X-Cache'] = outcome
+        return response
+
+    except Exception as e:
+        return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
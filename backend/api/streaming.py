@@ -0,0 +1,89 @@
+# Incremental JSON, CSV and NDJSON responses for listings too large to build in memory
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+_encoder = DjangoJSONEncoder()
+# Lines buffered before a chunk is sent
+FLUSH_EVERY = 512
+# Leading characters that make spreadsheet apps evaluate a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def wants_stream(request):
+    return request.GET.get('stream', '').lower() in ('1', 'true')
+
+
+def _json_list_chunks(key, items, count_key):
+    # {"<key>": [item, item, ...], "<count_key>": n}, flushed every few hundred items
+    buffer = ['{%s: [' % json.dumps(key)]
+    count = 0
+    for item in items:
+        if count:
+            buffer.append(',')
+        buffer.append(_encoder.encode(item))
+        count += 1
+        if len(buffer) >= FLUSH_EVERY:
+            yield ''.join(buffer).encode()
+            buffer = []
+    buffer.append('], %s: %d}' % (json.dumps(count_key), count))
+    yield ''.join(buffer).encode()
+
+
+def streaming_json_response(key, items, count_key='count'):
+    """Stream a JSON object holding the list `items` under `key` and its length under `count_key`.
+
+    `items` should be a lazy iterator (e.g. rendering a Mongo cursor with a
+    batch_size) so that only one batch is held in memory at a time.
+    """
+    return StreamingHttpResponse(_json_list_chunks(key, items, count_key), content_type='application/json')
+
+
+class _LineBuffer:
+    # csv.writer target that hands back each written line
+    def write(self, line):
+        return line
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    value = str(value)
+    return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+
+
+def _csv_chunks(header, rows):
+    writer = csv.writer(_LineBuffer())
+    buffer = [writer.writerow(header)]
+    for row in rows:
+        buffer.append(writer.writerow([_csv_cell(value) for value in row]))
+        if len(buffer) >= FLUSH_EVERY:
+            yield ''.join(buffer).encode()
+            buffer = []
+    yield ''.join(buffer).encode()
+
+
+def _ndjson_chunks(items):
+    buffer = []
+    for item in items:
+        buffer.append(_encoder.encode(item) + '\n')
+        if len(buffer) >= FLUSH_EVERY:
+            yield ''.join(buffer).encode()
+            buffer = []
+    yield ''.join(buffer).encode()
+
+
+def _attachment(response, filename):
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def streaming_csv_response(header, rows, filename):
+    """Stream `rows` (sequences of values) as a CSV download with a `header` line"""
+    return _attachment(StreamingHttpResponse(_csv_chunks(header, rows), content_type='text/csv; charset=utf-8'), filename)
+
+
+def streaming_ndjson_response(items, filename):
+    """Stream `items` as a newline-delimited JSON download"""
+    return _attachment(StreamingHttpResponse(_ndjson_chunks(items), content_type='application/x-ndjson'), filename)
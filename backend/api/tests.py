@@ -1,3 +1,407 @@
-from django.test import TestCase
+from datetime import datetime
+from unittest import mock
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from django.test import RequestFactory, SimpleTestCase, override_settings, tag
 
-# Create your tests here.
+from . import events, images, imports, registrations
+from .authentication import VerifiedTokenCache
+from .cache import HIT, MISS, VersionedCache
+from .catalog import bump_catalog_version
+from .counters import counter_update
+from .images import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, _parse_range, image_url
+from .imports import MAX_REPORTED_ERRORS, ImportReport, InvalidRow, clean_row
+from .lockout import MAX_LOGIN_ATTEMPTS, RecentlyLocked, record_failed_login
+from .pagination import InvalidCursor, cursor_for, decode_cursor, encode_cursor, keyset_filter
+from .passwords import _legacy_hash, hash_password, needs_rehash, verify_password
+from .ratelimit import _take, parse_rate
+from .registrations import SEAT_PROJECTION, claim_seat, registered_event_lookup, render_registered_event
+
+
+@tag('user-010')
+class VersionedCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.version = 1
+        self.cache = VersionedCache(maxsize=2, ttl=60, stale_ttl=0, version_func=lambda: self.version)
+
+    def test_hit_after_miss(self):
+        self.assertEqual(self.cache.get_or_compute('a', lambda: 1), (1, MISS))
+        self.assertEqual(self.cache.get_or_compute('a', lambda: 2), (1, HIT))
+
+    def test_new_version_recomputes(self):
+        self.cache.get_or_compute('a', lambda: 1)
+        self.version = 2
+        self.assertEqual(self.cache.get_or_compute('a', lambda: 2), (2, MISS))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.get_or_compute('a', lambda: 1)
+        self.cache.get_or_compute('b', lambda: 2)
+        self.cache.get_or_compute('a', lambda: 1)
+        self.cache.get_or_compute('c', lambda: 3)
+        self.assertEqual(self.cache.get_or_compute('a', lambda: 4), (1, HIT))
+        self.assertEqual(self.cache.get_or_compute('b', lambda: 5), (5, MISS))
+        self.assertEqual(self.cache.stats()['evictions'], 2)
+
+
+@tag('user-004')
+class PaginationTests(SimpleTestCase):
+    SORT = [('created_at', -1), ('_id', -1)]
+
+    def test_cursor_round_trip(self):
+        document = {'created_at': datetime(2025, 7, 1, 12, 30), '_id': ObjectId()}
+        token = cursor_for(document, self.SORT)
+        self.assertEqual(decode_cursor(token, 2), [document['created_at'], document['_id']])
+
+    def test_decode_rejects_garbage_and_wrong_size(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not a cursor', 2)
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor([1]), 2)
+
+    def test_keyset_filter(self):
+        created_at, oid = datetime(2025, 7, 1), ObjectId()
+        self.assertEqual(keyset_filter(self.SORT, encode_cursor([created_at, oid])), {'$or': [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': oid}},
+        ]})
+
+    def test_keyset_filter_ascending(self):
+        self.assertEqual(keyset_filter([('n', 1)], encode_cursor([5])), {'$or': [{'n': {'$gt': 5}}]})
+
+
+@tag('user-007')
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(_parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(_parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(_parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(_parse_range('bytes=990-2000', 1000), (990, 999))
+
+    def test_ignored_and_unsatisfiable(self):
+        self.assertIsNone(_parse_range('items=0-1', 1000))
+        self.assertIsNone(_parse_range('bytes=-', 1000))
+        self.assertFalse(_parse_range('bytes=1000-', 1000))
+        self.assertFalse(_parse_range('bytes=5-2', 1000))
+        self.assertFalse(_parse_range('bytes=-0', 1000))
+
+
+@tag('user-007')
+class EventImageTests(SimpleTestCase):
+    PIXEL = 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+
+    def test_image_url(self):
+        request = RequestFactory().get('/')
+        oid = ObjectId()
+        self.assertEqual(image_url(request, {'_id': oid, 'image_url': 'https://cdn.example.com/a.png'}), 'https://cdn.example.com/a.png')
+        self.assertEqual(image_url(request, {'_id': oid}), f'http://testserver/api/events/{oid}/image')
+        self.assertEqual(
+            image_url(request, {'_id': oid, 'image_id': 'ab' * 32, 'image_url': 'https://cdn.example.com/a.png'}, variant=None),
+            f'http://testserver/api/events/{oid}/image?v={"ab" * 8}'
+        )
+
+    def test_unversioned_legacy_image_is_revalidated(self):
+        collection = mock.MagicMock()
+        collection.find_one.return_value = {'_id': ObjectId(), 'image': self.PIXEL}
+        with mock.patch.object(images, 'get_events_collection', return_value=collection):
+            response = self.client.get(f'/api/events/{ObjectId()}/image')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], REVALIDATE_CACHE_CONTROL)
+        self.assertNotEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+
+@tag('user-024')
+class TokenBucketTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/m'), (10, 10 / 60))
+        self.assertEqual(parse_rate('5/s'), (5, 5))
+
+    def test_burst_then_refill(self):
+        state = None
+        for _ in range(3):
+            state, wait = _take(state, 3, 1, 100.0)
+            self.assertEqual(wait, 0)
+        state, wait = _take(state, 3, 1, 100.0)
+        self.assertEqual(wait, 1)
+        state, wait = _take(state, 3, 1, 101.0)
+        self.assertEqual(wait, 0)
+
+    def test_refill_is_capped(self):
+        state, _ = _take(None, 2, 1, 0.0)
+        state, _ = _take(state, 2, 1, 1000.0)
+        self.assertEqual(state, (1, 1000.0))
+
+
+@tag('user-013')
+@override_settings(PASSWORD_SCRYPT_N=1024, PASSWORD_SCRYPT_R=8, PASSWORD_SCRYPT_P=1)
+class PasswordTests(SimpleTestCase):
+    def test_scrypt_round_trip(self):
+        hashed = hash_password('Secret#123')
+        self.assertTrue(hashed.startswith('scrypt$1024$8$1$'))
+        self.assertTrue(verify_password('Secret#123', hashed))
+        self.assertFalse(verify_password('secret#123', hashed))
+        self.assertFalse(needs_rehash(hashed))
+
+    def test_legacy_hash_verifies_and_needs_rehash(self):
+        hashed = _legacy_hash('Secret#123')
+        self.assertTrue(verify_password('Secret#123', hashed))
+        self.assertFalse(verify_password('Other#123', hashed))
+        self.assertTrue(needs_rehash(hashed))
+
+    def test_other_work_factor_needs_rehash(self):
+        hashed = hash_password('Secret#123')
+        with self.settings(PASSWORD_SCRYPT_N=2048):
+            self.assertTrue(needs_rehash(hashed))
+            self.assertTrue(verify_password('Secret#123', hashed))
+
+    def test_malformed_hash(self):
+        self.assertFalse(verify_password('Secret#123', ''))
+        self.assertFalse(verify_password('Secret#123', 'scrypt$broken'))
+
+
+@tag('user-010')
+class GetEventsTests(SimpleTestCase):
+    def setUp(self):
+        events.EVENT_LIST_CACHE.clear()
+        bump_catalog_version()
+        self.event = {
+            '_id': ObjectId(), 'title': 'Jazz night', 'created_at': datetime(2025, 7, 1),
+            'updated_at': datetime(2025, 7, 1), 'type': 'FREE',
+        }
+        self.collection = mock.MagicMock()
+        self.collection.find_one.return_value = {'updated_at': self.event['updated_at']}
+        self.collection.find.return_value.sort.return_value.skip.return_value.limit.return_value = [self.event]
+        self.collection.count_documents.return_value = 1
+        patcher = mock.patch.object(events, 'get_events_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_query_string(self):
+        response = self.client.get('/api/events/', {'limit': '5', 'page': '1', 'fields': 'id,title,type'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'events': [{'id': str(self.event['_id']), 'title': 'Jazz night', 'type': 'FREE'}],
+            'pagination': {'limit': 5, 'has_more': False, 'next_cursor': None, 'page': 1, 'total': 1},
+        })
+        self.assertEqual(response['X-Cache'], MISS)
+        self.assertEqual(self.client.get('/api/events/', {'limit': '5', 'page': '1', 'fields': 'id,title,type'})['X-Cache'], HIT)
+
+    @tag('user-011')
+    def test_revalidation_is_answered_from_the_cache(self):
+        etag = self.client.get('/api/events/?limit=5&fields=id,title')['ETag']
+        self.collection.reset_mock()
+        response = self.client.get('/api/events/?limit=5&fields=id,title', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Cache'], HIT)
+        self.assertEqual(self.collection.mock_calls, [])
+
+    @tag('user-011')
+    def test_etag_changes_when_an_event_ends(self):
+        request = RequestFactory().get('/api/events/')
+        self.collection.find_one.return_value = {'updated_at': self.event['updated_at'], 'end_at': datetime(2025, 7, 2)}
+        etag, last_modified = events._events_validators(request)
+        self.collection.find_one.return_value = {'updated_at': self.event['updated_at'], 'end_at': datetime(2025, 7, 3)}
+        self.assertNotEqual(events._events_validators(request), (etag, last_modified))
+
+    @tag('user-004')
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get('/api/events/', {'after': 'junk'}).status_code, 400)
+
+    @tag('user-004')
+    def test_limit_is_validated_and_capped(self):
+        for limit in ('0', '-1', 'ten'):
+            self.assertEqual(self.client.get('/api/events/', {'limit': limit}).status_code, 400)
+        self.assertEqual(self.client.get('/api/events/', {'page': '0'}).status_code, 400)
+        response = self.client.get('/api/events/', {'limit': '1000', 'fields': 'id'})
+        self.assertEqual(response.json()['pagination']['limit'], events.MAX_LIMIT)
+        self.collection.find.return_value.sort.return_value.skip.return_value.limit.assert_called_with(events.MAX_LIMIT + 1)
+
+
+@tag('user-003')
+class RegisteredEventsTests(SimpleTestCase):
+    def test_lookup_projects_event_fields_inside_the_join(self):
+        lookup, unwind, project = registered_event_lookup(('id', 'title', 'payment_status'))
+        self.assertEqual(lookup['$lookup']['pipeline'][1], {'$project': {'_id': 1, 'title': 1}})
+        self.assertEqual(unwind['$unwind']['preserveNullAndEmptyArrays'], True)
+        self.assertEqual(project['$project'], {'event_id': 1, 'event': 1, '_id': 1, 'payment_status': 1})
+
+    def test_deleted_event_is_rendered_as_missing(self):
+        request = RequestFactory().get('/')
+        registration = {'_id': ObjectId(), 'event_id': 'abc', 'payment_status': 'paid', 'registration_date': datetime(2025, 7, 1)}
+        self.assertEqual(
+            render_registered_event(registration, ('id', 'title', 'payment_status', 'registration_date'), request),
+            {'id': 'abc', 'missing': True, 'payment_status': 'paid', 'registration_date': '2025-07-01 00:00:00'}
+        )
+        registration['event'] = {'_id': ObjectId(), 'title': 'Jazz night'}
+        self.assertEqual(
+            render_registered_event(registration, ('id', 'title'), request),
+            {'id': str(registration['event']['_id']), 'title': 'Jazz night'}
+        )
+
+
+@tag('user-015')
+class SeatClaimTests(SimpleTestCase):
+    def test_claim_seat_only_matches_active_events_with_room(self):
+        collection, oid = mock.MagicMock(), ObjectId()
+        claim_seat(collection, oid, 'paid')
+        (query, update), options = collection.find_one_and_update.call_args
+        self.assertEqual(query, {
+            '_id': oid,
+            'status': 'active',
+            '$or': [
+                {'capacity': None},
+                {'$expr': {'$lt': [{'$ifNull': ['$seats_taken', 0]}, '$capacity']}}
+            ]
+        })
+        self.assertEqual(update[0]['$set']['seats_taken'], {'$add': [{'$ifNull': ['$seats_taken', 0]}, 1]})
+        self.assertEqual(options, {'projection': SEAT_PROJECTION, 'return_document': ReturnDocument.AFTER})
+
+    def test_counter_update(self):
+        paid = counter_update('paid', seats=1)[0]['$set']
+        self.assertEqual(set(paid), {
+            'registration_stats.total', 'registration_stats.paid', 'registration_stats.revenue',
+            'seats_taken', 'stats_updated_at',
+        })
+        undo = counter_update('pending', sign=-1, seats=-1)[0]['$set']
+        self.assertEqual(undo['registration_stats.pending'], {'$add': [{'$ifNull': ['$registration_stats.pending', 0]}, -1]})
+        self.assertEqual(undo['seats_taken'], {'$add': [{'$ifNull': ['$seats_taken', 0]}, -1]})
+        self.assertNotIn('registration_stats.revenue', undo)
+        waitlisted = counter_update('paid', waitlisted=True)[0]['$set']
+        self.assertEqual(set(waitlisted), {'registration_stats.waitlisted', 'stats_updated_at'})
+
+    def test_failed_confirmation_is_rolled_back(self):
+        events_collection, registrations_collection = mock.MagicMock(), mock.MagicMock()
+        events_collection.find_one_and_update.return_value = {'title': 'Jazz night', 'type': 'FREE', 'cost': 0, 'capacity': None}
+        registrations_collection.update_one.side_effect = PyMongoError('down')
+        claims = {'user_type': 'user', 'user_id': 'u1', 'name': 'Ann', 'email': 'ann@example.com'}
+        with mock.patch.object(registrations, 'get_token_claims', return_value=claims), \
+                mock.patch.object(registrations, 'get_events_collection', return_value=events_collection), \
+                mock.patch.object(registrations, 'get_registrations_collection', return_value=registrations_collection):
+            response = self.client.post(f'/api/events/{ObjectId()}/register/', '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 500)
+        inserted_id = registrations_collection.insert_one.return_value.inserted_id
+        registrations_collection.delete_one.assert_called_once_with({'_id': inserted_id})
+        self.assertEqual(events_collection.update_one.call_args[0][1][0]['$set']['seats_taken'],
+                         {'$add': [{'$ifNull': ['$seats_taken', 0]}, -1]})
+
+
+@tag('user-016')
+class ImportRowTests(SimpleTestCase):
+    def test_clean_row(self):
+        self.assertEqual(clean_row({'name': ' Ann Lee ', 'email': 'Ann@Example.com', 'phone': 5}), {
+            'user_name': 'Ann Lee',
+            'user_name_key': registrations.search_key('Ann Lee'),
+            'user_email': 'ann@example.com',
+            'phone_number': '5',
+            'payment_status': 'pending',
+            'payment_method': 'none',
+        })
+
+    def test_clean_row_rejects(self):
+        for row in ({'email': 'ann@example.com'}, {'name': 'Ann', 'email': 'not-an-email'}, InvalidRow('Invalid JSON')):
+            with self.assertRaises(InvalidRow):
+                clean_row(row)
+
+    def test_reported_errors_are_capped(self):
+        report = ImportReport()
+        for number in range(MAX_REPORTED_ERRORS + 5):
+            report.error(number, 'Name is required')
+        result = report.as_dict()
+        self.assertEqual(result['failed'], MAX_REPORTED_ERRORS + 5)
+        self.assertEqual(len(result['errors']), MAX_REPORTED_ERRORS)
+        self.assertTrue(result['errors_truncated'])
+        self.assertFalse(ImportReport().as_dict()['errors_truncated'])
+
+    def test_malformed_event_id(self):
+        with mock.patch.object(imports, 'get_token_claims', return_value={'user_type': 'admin'}):
+            response = self.client.post('/api/events/junk/participants/import/', b'', content_type='text/csv')
+        self.assertEqual(response.status_code, 404)
+
+
+@tag('user-023')
+class LockoutTests(SimpleTestCase):
+    def test_failed_login_pipeline_locks_at_the_limit(self):
+        collection = mock.MagicMock()
+        collection.find_one_and_update.return_value = {'account_locked': False}
+        self.assertFalse(record_failed_login(collection, 'u1'))
+        (query, pipeline), _ = collection.find_one_and_update.call_args
+        self.assertEqual(query, {'_id': 'u1', 'account_locked': {'$ne': True}})
+        self.assertEqual(pipeline[1], {'$set': {'account_locked': {'$gte': ['$login_attempts', MAX_LOGIN_ATTEMPTS]}}})
+        collection.find_one_and_update.return_value = {'account_locked': True}
+        self.assertTrue(record_failed_login(collection, 'u1'))
+        # Already locked by another request
+        collection.find_one_and_update.return_value = None
+        self.assertTrue(record_failed_login(collection, 'u1'))
+
+    @override_settings(LOCKED_ACCOUNT_CACHE_TTL=300)
+    def test_recently_locked_expires_and_is_bounded(self):
+        locked = RecentlyLocked(maxsize=2)
+        with mock.patch('api.lockout.time.monotonic', return_value=1000.0):
+            locked.add('a@example.com')
+            locked.add('b@example.com')
+            locked.add('c@example.com')
+            self.assertNotIn('a@example.com', locked)
+            self.assertIn('b@example.com', locked)
+        with mock.patch('api.lockout.time.monotonic', return_value=1300.0):
+            self.assertNotIn('c@example.com', locked)
+
+
+@tag('user-014')
+class VerifiedTokenCacheTests(SimpleTestCase):
+    def test_entries_drop_out_at_exp(self):
+        cache = VerifiedTokenCache(maxsize=10)
+        claims = {'user_id': 'u1', 'exp': 1000}
+        cache.put(b'a', claims)
+        self.assertEqual(cache.get(b'a', 999), claims)
+        self.assertIsNone(cache.get(b'a', 1000))
+        self.assertIsNone(cache.get(b'a', 999))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = VerifiedTokenCache(maxsize=1)
+        cache.put(b'a', {'exp': None})
+        cache.put(b'b', {'exp': None})
+        self.assertIsNone(cache.get(b'a', 0))
+        self.assertEqual(cache.get(b'b', 0), {'exp': None})
+
+
+@tag('user-017')
+class ExportParticipantsTests(SimpleTestCase):
+    def setUp(self):
+        self.events_collection, self.registrations_collection = mock.MagicMock(), mock.MagicMock()
+        for patcher in (
+            mock.patch.object(registrations, 'authenticate_request', return_value={'user_type': 'admin'}),
+            mock.patch.object(registrations, 'get_events_collection', return_value=self.events_collection),
+            mock.patch.object(registrations, 'get_registrations_collection', return_value=self.registrations_collection),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_unknown_or_malformed_event(self):
+        self.assertEqual(self.client.get('/api/events/junk"x/participants/export/?as=csv').status_code, 404)
+        self.events_collection.find_one.return_value = None
+        self.assertEqual(self.client.get(f'/api/events/{ObjectId()}/participants/export/?as=csv').status_code, 404)
+        self.registrations_collection.find.assert_not_called()
+
+    def test_filename_uses_the_event_id(self):
+        oid = ObjectId()
+        self.events_collection.find_one.return_value = {'_id': oid}
+        self.registrations_collection.find.return_value.sort.return_value.batch_size.return_value = []
+        response = self.client.get(f'/api/events/{oid}/participants/export/?as=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'filename="participants-{oid}.ndjson"', response['Content-Disposition'])
+
+
+@tag('user-018')
+class EventParticipantsTests(SimpleTestCase):
+    def test_limit_is_validated_and_capped(self):
+        collection = mock.MagicMock()
+        collection.find.return_value.sort.return_value.limit.return_value = []
+        collection.count_documents.return_value = 0
+        with mock.patch.object(registrations, 'get_token_claims', return_value={'user_type': 'admin'}), \
+                mock.patch.object(registrations, 'get_registrations_collection', return_value=collection):
+            url = f'/api/events/{ObjectId()}/participants/'
+            for limit in ('ten', '-5', '0'):
+                self.assertEqual(self.client.get(url, {'limit': limit}).status_code, 400)
+            response = self.client.get(url, {'limit': '100000', 'fields': 'id'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pagination']['limit'], registrations.MAX_PARTICIPANTS_LIMIT)
@@ -5,6 +5,9 @@ from . import admins
 from . import users
 from . import events
 from . import registrations
+from . import images
+from . import imports
+from . import search
 
 urlpatterns = [
     # Authentication endpoints
@@ -20,8 +23,13 @@ urlpatterns = [
     # Event endpoints
     path('events/create/', events.create_event, name='create_event'),
     path('events/', events.get_events, name='get_events'),
+    path('events/search/', search.search_events, name='search_events'),
+    path('events/facets/', search.get_event_facets, name='get_event_facets'),
     path('admin/events/', events.get_admin_events, name='get_admin_events'),
+    path('events/<str:event_id>/image', images.get_event_image, name='get_event_image'),
     path('events/<str:event_id>/register/', registrations.register_for_event, name='register_for_event'),
     path('events/<str:event_id>/participants/', registrations.get_event_participants, name='get_event_participants'),
+    path('events/<str:event_id>/participants/export/', registrations.export_event_participants, name='export_event_participants'),
+    path('events/<str:event_id>/participants/import/', imports.import_participants, name='import_participants'),
     path('user/registered-events/', registrations.get_user_registered_events, name='get_user_registered_events'),
 ]
\ No newline at end of file
@@ -1,11 +1,9 @@
 # User registration and login for users collection
 import json
 import jwt
-import hashlib
 import os
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -15,6 +13,10 @@ from django.views.decorators.csrf import csrf_exempt
 import re
 from dotenv import load_dotenv
 
+from .accounts import find_by_email, normalize_email
+from .mongo import get_users_collection
+from .passwords import PasswordHashingBusy, hash_password, hashing_busy_response, upgrade_password_hash, verify_password
+
 load_dotenv()
 
 MIN_PASSWORD_LENGTH = 8
@@ -22,22 +24,8 @@ MIN_PASSWORD_LENGTH = 8
 PASSWORD_REGEX = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+={}\[\]:;<>,.?~\\/-]).{8,}$"
 
 JWT_EXPIRATION_DELTA = timedelta(days=7)
-MONGODB_URI = os.getenv('MONGODB_URI')
-MONGODB_DATABASE = os.getenv('MONGODB_DATABASE')
 SECRET_KEY = os.getenv('SECRET_KEY')
 
-def get_users_collection():
-    client = MongoClient(MONGODB_URI)
-    db = client[MONGODB_DATABASE]
-    return client, db['users']
-
-def hash_password(password):
-    salt = os.getenv('PASSWORD_SALT', 'default-salt-value')
-    return hashlib.sha256((password + salt).encode()).hexdigest()
-
-def verify_password(password, hashed_password):
-    return hash_password(password) == hashed_password
-
 def validate_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
@@ -67,7 +55,7 @@ def user_signup(request):
     try:
         data = json.loads(request.body)
         name = data.get('name', '').strip()
-        email = data.get('email', '').strip().lower()
+        email = normalize_email(data.get('email', ''))
         password = data.get('password', '')
         confirm_password = data.get('confirmPassword', '')
 
@@ -87,12 +75,11 @@ def user_signup(request):
         if not is_valid:
             return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
 
-        client, users = get_users_collection()
+        users = get_users_collection()
         try:
-            existing = users.find_one({'email': email})
-            if existing:
+            # Cheap indexed check first so a taken address never costs a password hash
+            if find_by_email(users, email, {'_id': 1}):
                 return Response({'error': 'User with this email already exists'}, status=status.HTTP_409_CONFLICT)
-            
             user_data = {
                 'name': name,
                 'email': email,
@@ -100,7 +87,11 @@ def user_signup(request):
                 'created_at': datetime.utcnow(),
                 'updated_at': datetime.utcnow(),
             }
-            result = users.insert_one(user_data)
+            # The unique email index still rejects a concurrent signup for the same address
+            try:
+                result = users.insert_one(user_data)
+            except DuplicateKeyError:
+                return Response({'error': 'User with this email already exists'}, status=status.HTTP_409_CONFLICT)
             user_data['_id'] = result.inserted_id
             token = generate_jwt_token(user_data)
             
@@ -114,8 +105,10 @@ def user_signup(request):
                 },
                 'message': 'User registered successfully'
             }, status=status.HTTP_201_CREATED)
-        finally:
-            client.close()
+        except PasswordHashingBusy:
+            return hashing_busy_response()
+        except PyMongoError as e:
+            return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -125,7 +118,7 @@ def user_signup(request):
 def user_login(request):
     try:
         data = json.loads(request.body)
-        email = data.get('email', '').strip().lower()
+        email = normalize_email(data.get('email', ''))
         password = data.get('password', '')
         
         if not email or not password:
@@ -134,11 +127,12 @@ def user_login(request):
         if not validate_email(email):
             return Response({'error': 'Please provide a valid email address'}, status=status.HTTP_400_BAD_REQUEST)
             
-        client, users = get_users_collection()
+        users = get_users_collection()
         try:
-            user = users.find_one({'email': email})
+            user = find_by_email(users, email)
             if not user or not verify_password(password, user['password']):
                 return Response({'error': 'Invalid email or password'}, status=status.HTTP_401_UNAUTHORIZED)
+            upgrade_password_hash(users, user, password)
             
             token = generate_jwt_token(user)
             return Response({
@@ -151,7 +145,9 @@ def user_login(request):
                 },
                 'message': 'Login successful'
             }, status=status.HTTP_200_OK)
-        finally:
-            client.close()
+        except PasswordHashingBusy:
+            return hashing_busy_response()
+        except PyMongoError as e:
+            return Response({'error': f'Database error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,11 +1,9 @@
 import json
 import jwt
-import hashlib
 import os
 from datetime import datetime, timedelta
 from bson import ObjectId
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
@@ -14,6 +12,11 @@ from rest_framework import status
 import re
 from dotenv import load_dotenv
 
+from .accounts import find_by_email, normalize_email
+from .lockout import recently_locked, record_failed_login
+from .mongo import get_client, get_database
+from .passwords import PasswordHashingBusy, hash_password, hashing_busy_response, upgrade_password_hash, verify_password
+
 # Load environment variables
 load_dotenv()
 
@@ -22,41 +25,17 @@ MIN_PASSWORD_LENGTH = 8
 JWT_EXPIRATION_DELTA = timedelta(days=7)
 SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
 
-MONGODB_URI = os.getenv('MONGODB_URI')
-MONGODB_DATABASE = os.getenv('MONGODB_DATABASE')
-
-# MongoDB connection with error handling
+# MongoDB collection on the shared connection pool
 def get_mongo_client():
     try:
-        client = MongoClient(
-            MONGODB_URI,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=10000,
-            socketTimeoutMS=20000,
-            maxPoolSize=50,
-            retryWrites=True,
-            retryReads=True
-        )
-        # Verify the connection
-        client.admin.command('ping')
-        db = client[MONGODB_DATABASE]
+        client = get_client()
+        db = get_database()
         collection = db[settings.MONGODB_COLLECTION]
         return client, db, collection
     except PyMongoError as e:
         print(f"MongoDB connection error: {str(e)}")
         return None, None, None
 
-# Password hashing with salt
-def hash_password(password):
-    """Hash password using SHA-256 with salt"""
-    salt = os.getenv('PASSWORD_SALT', 'default-salt-value')
-    salted_password = password + salt
-    return hashlib.sha256(salted_password.encode()).hexdigest()
-
-def verify_password(password, hashed_password):
-    """Verify password against hash"""
-    return hash_password(password) == hashed_password
-
 def generate_jwt_token(user_data):
     """Generate JWT token for user"""
     payload = {
@@ -139,12 +118,8 @@ def register_user(request):
             )
 
         try:
-            # Check if user already exists (case-insensitive)
-            existing_user = collection.find_one(
-                {'email': {'$regex': f"^{data['email'].lower()}$", '$options': 'i'}}
-            )
-
-            if existing_user:
+            # Cheap indexed check first so a taken address never costs a password hash
+            if find_by_email(collection, data['email'], {'_id': 1}):
                 return Response(
                     {'error': 'User with this email exists'},
                     status=status.HTTP_409_CONFLICT
@@ -154,7 +129,7 @@ def register_user(request):
             user_data = {
                 'first_name': data['first_name'].strip(),
                 'last_name': data['last_name'].strip(),
-                'email': data['email'].lower(),
+                'email': normalize_email(data['email']),
                 'password': hash_password(data['password']),
                 'created_at': datetime.utcnow(),
                 'updated_at': datetime.utcnow(),
@@ -164,8 +139,14 @@ def register_user(request):
                 'account_locked': False
             }
 
-            # Insert user into MongoDB
-            result = collection.insert_one(user_data)
+            # Insert user into MongoDB; the case-insensitive unique email index rejects concurrent duplicates
+            try:
+                result = collection.insert_one(user_data)
+            except DuplicateKeyError:
+                return Response(
+                    {'error': 'User with this email exists'},
+                    status=status.HTTP_409_CONFLICT
+                )
             user_data['_id'] = result.inserted_id
 
             # Generate JWT token
@@ -189,13 +170,13 @@ def register_user(request):
                 status=status.HTTP_201_CREATED
             )
 
+        except PasswordHashingBusy:
+            return hashing_busy_response()
         except PyMongoError as e:
             return Response(
                 {'error': f'Database operation failed: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        finally:
-            client.close()
 
     except Exception as e:
         # Log the unexpected error for debugging
@@ -234,6 +215,14 @@ def login_user(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Refuse accounts this process has just seen locked without touching the database
+        email = normalize_email(data['email'])
+        if email in recently_locked:
+            return Response(
+                {'error': 'Account is locked. Please contact support.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
         # Get MongoDB connection
         client, db, collection = get_mongo_client()
         if collection is None:
@@ -243,10 +232,8 @@ def login_user(request):
             )
 
         try:
-            # Find user by email (case-insensitive)
-            user = collection.find_one(
-                {'email': {'$regex': f"^{data['email'].lower()}$", '$options': 'i'}}
-            )
+            # Find user by email (case-insensitive, through the email index)
+            user = find_by_email(collection, email)
 
             if not user:
                 return Response(
@@ -256,6 +243,7 @@ def login_user(request):
 
             # Check if account is locked
             if user.get('account_locked', False):
+                recently_locked.add(email)
                 return Response(
                     {'error': 'Account is locked. Please contact support.'},
                     status=status.HTTP_403_FORBIDDEN
@@ -263,18 +251,9 @@ def login_user(request):
 
             # Verify password
             if not verify_password(data['password'], user['password']):
-                # Increment login attempts
-                collection.update_one(
-                    {'_id': user['_id']},
-                    {'$inc': {'login_attempts': 1}}
-                )
-
-                # Lock account after 5 failed attempts
-                if user.get('login_attempts', 0) + 1 >= 5:
-                    collection.update_one(
-                        {'_id': user['_id']},
-                        {'$set': {'account_locked': True}}
-                    )
+                # Count the attempt and lock after MAX_LOGIN_ATTEMPTS in one write
+                if record_failed_login(collection, user['_id']):
+                    recently_locked.add(email)
                     return Response(
                         {'error': 'Account is locked due to too many failed login attempts. Please contact support.'},
                         status=status.HTTP_403_FORBIDDEN
@@ -302,6 +281,7 @@ def login_user(request):
                     }
                 }
             )
+            upgrade_password_hash(collection, user, data['password'])
 
             # Generate JWT token
             token = generate_jwt_token(user)
@@ -324,13 +304,13 @@ def login_user(request):
                 status=status.HTTP_200_OK
             )
 
+        except PasswordHashingBusy:
+            return hashing_busy_response()
         except PyMongoError as e:
             return Response(
                 {'error': f'Database operation failed: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        finally:
-            client.close()
             
     except Exception as e:
         # Log the unexpected error for debugging
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'api.ratelimit.RateLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -132,12 +133,80 @@ CSRF_TRUSTED_ORIGINS = [
 # MongoDB configuration
 MONGODB_URI = os.getenv('MONGODB_URI')
 MONGODB_DATABASE = os.getenv('MONGODB_DATABASE')
+MONGODB_COLLECTION = os.getenv('MONGODB_COLLECTION', 'users')
+
+# Shared connection pool (see api/mongo.py)
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', 50))
+MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', 0))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', 300000))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 5000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', 10000))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', 20000))
+
+# Seconds a cached active-event count may be served before it is recounted
+EVENT_COUNT_CACHE_TTL = int(os.getenv('EVENT_COUNT_CACHE_TTL', 60))
+
+# In-process cache of public event listing pages (size 0 disables); entries are
+# fresh for TTL seconds, then served stale for STALE_TTL more while refreshing
+EVENT_LIST_CACHE_SIZE = int(os.getenv('EVENT_LIST_CACHE_SIZE', 256))
+EVENT_LIST_CACHE_TTL = int(os.getenv('EVENT_LIST_CACHE_TTL', 15))
+EVENT_LIST_CACHE_STALE_TTL = int(os.getenv('EVENT_LIST_CACHE_STALE_TTL', 45))
+
+# Seconds between in-process sweeps that mark ended events inactive. Off by default:
+# schedule 'manage.py expire_events' instead, or set this on a single process only, since
+# every process loading Django (workers, management commands) would start its own sweeper.
+# Listings filter ended events out either way.
+EVENT_EXPIRY_SWEEP_INTERVAL = int(os.getenv('EVENT_EXPIRY_SWEEP_INTERVAL', 0))
+
+# Documents fetched per Mongo round trip when a listing is streamed (?stream=1)
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+
+# Rows written per bulk_write when admins import participants
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 1000))
+
+# Password hashing: threads hashing concurrently, extra logins allowed to queue,
+# how long one more may wait for a slot before getting a 503, and the scrypt work factor
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_MAX_QUEUED = int(os.getenv('PASSWORD_HASH_MAX_QUEUED', 16))
+PASSWORD_HASH_ADMIT_TIMEOUT_MS = int(os.getenv('PASSWORD_HASH_ADMIT_TIMEOUT_MS', 2000))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', 2))
+PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+
+# Seconds a process keeps refusing logins to an account it saw locked, without querying it again
+LOCKED_ACCOUNT_CACHE_TTL = int(os.getenv('LOCKED_ACCOUNT_CACHE_TTL', 300))
+
+# Per-route token buckets: url name -> [(scope, 'count/period')], scope 'ip' or 'user' (JWT subject),
+# period s, m or h; the count is also the burst size
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMITS = {
+    'user_login': [('ip', '10/m')],
+    'admin_login': [('ip', '10/m')],
+    'user_signup': [('ip', '5/m')],
+    'admin_signup': [('ip', '5/m')],
+    'register_for_event': [('user', '10/m'), ('ip', '60/m')],
+    'import_participants': [('user', '10/h')],
+    'search_events': [('ip', '120/m')],
+}
+# 'memory' keeps buckets per process; 'cache' shares them through the Django cache below
+# (local memory unless CACHES points it at Redis or Memcached)
+RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'memory')
+RATE_LIMIT_CACHE_ALIAS = os.getenv('RATE_LIMIT_CACHE_ALIAS', 'default')
+# Reverse proxies in front of the app; the client IP is then read from X-Forwarded-For
+RATE_LIMIT_PROXY_COUNT = int(os.getenv('RATE_LIMIT_PROXY_COUNT', 0))
+# Requests with this value in X-RateLimit-Bypass skip the limits (load tests); empty disables it
+RATE_LIMIT_BYPASS_TOKEN = os.getenv('RATE_LIMIT_BYPASS_TOKEN', '')
+
+# Worker processes rendering image thumbnails after upload (0 disables; needs Pillow)
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
 
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -151,3 +220,5 @@ REST_FRAMEWORK = {
 import datetime
 JWT_SECRET_KEY = SECRET_KEY
 JWT_EXPIRATION_DELTA = datetime.timedelta(days=7)
+# Verified tokens kept in memory so repeat requests skip the signature check (0 disables)
+JWT_VERIFIED_CACHE_SIZE = int(os.getenv('JWT_VERIFIED_CACHE_SIZE', 4096))
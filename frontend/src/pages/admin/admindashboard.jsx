@@ -210,9 +210,7 @@ const AdminDashboard = () => {
               ) : (
                 <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-8">
                   {events.map((event) => {
-                    const imgSrc = event.image && typeof event.image === 'string' && event.image.startsWith('data:image')
-                      ? event.image
-                      : event.image_url || 'https://placehold.co/400x250/2C2B6A/FFFFFF?text=Event';
+                    const imgSrc = event.image || 'https://placehold.co/400x250/2C2B6A/FFFFFF?text=Event';
                     const title = event.title || 'Untitled Event';
                     const date = event.date || '';
                     const location = event.location || '';
@@ -25,7 +25,7 @@ const UserDashboard = () => {
   const [events, setEvents] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
-  const [page, setPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState(null);
   const [hasMore, setHasMore] = useState(true);
   const [loadingMore, setLoadingMore] = useState(false);
   
@@ -41,12 +41,13 @@ const UserDashboard = () => {
       setLoading(true);
       setError('');
       try {
-        const response = await fetch(`http://127.0.0.1:8000/api/events/?page=1&limit=9`);
+        const response = await fetch(`http://127.0.0.1:8000/api/events/?after=&limit=9`);
         const data = await response.json();
         if (response.ok && Array.isArray(data.events)) {
           setEvents(data.events);
           setFilteredEvents(data.events);
           setHasMore(data.pagination ? data.pagination.has_more : false);
+          setNextCursor(data.pagination ? data.pagination.next_cursor : null);
         } else {
           setEvents([]);
           setFilteredEvents([]);
@@ -67,17 +68,16 @@ const UserDashboard = () => {
 
   // Load more events
   const handleLoadMore = async () => {
-    if (!hasMore || loadingMore) return;
+    if (!hasMore || !nextCursor || loadingMore) return;
     setLoadingMore(true);
-    const nextPage = page + 1;
     try {
-      const response = await fetch(`http://127.0.0.1:8000/api/events/?page=${nextPage}&limit=9`);
+      const response = await fetch(`http://127.0.0.1:8000/api/events/?after=${encodeURIComponent(nextCursor)}&limit=9`);
       const data = await response.json();
       if (response.ok && Array.isArray(data.events)) {
         setEvents(prev => [...prev, ...data.events]);
         setFilteredEvents(prev => [...prev, ...data.events]);
-        setPage(nextPage);
         setHasMore(data.pagination ? data.pagination.has_more : false);
+        setNextCursor(data.pagination ? data.pagination.next_cursor : null);
       } else {
         setHasMore(false);
       }